@@ -1,21 +1,54 @@
 CREATE TABLE query (
     id               serial PRIMARY KEY NOT NULL,
     published_at     timestamp NOT NULL DEFAULT NOW(),
-    phrase           text NOT NULL UNIQUE
+    phrase           text NOT NULL UNIQUE,
+    since_id         bigint,                  -- newest stored tweet id (watermark)
+    priority         integer NOT NULL DEFAULT 1,  -- share of API requests budget
+    active           boolean NOT NULL DEFAULT true
 );
-CREATE INDEX idx_query_phrase on query (lower(phrase));
+-- Phrase ignores register, as Twitter search does, so statistic of phrase
+-- is counted from tweets of one row.
+CREATE UNIQUE INDEX idx_query_phrase on query (lower(phrase));
 
--- Best of all keep this table without indexes for write performance.
--- In future we can split tables into read and write tables with syncing job for them.
+-- Checkpoints of historical backfill (see `bg_tasks/backfill.py`), one row
+-- per time window of phrase. Scroll of window resumes from it's `max_id`,
+-- live consumer watermark `query.since_id` is never touched by backfill.
+CREATE TABLE backfill (
+    query_id         bigint NOT NULL REFERENCES query (id),
+    window_start     timestamp NOT NULL,
+    window_end       timestamp NOT NULL,
+    max_id           bigint,                  -- next page, NULL from window end
+    fetched          bigint NOT NULL DEFAULT 0,
+    done             boolean NOT NULL DEFAULT false,
+    updated_at       timestamp NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (query_id, window_start, window_end)
+);
+
+-- Tweets are partitioned by month of `published_at` (see `create_partitions`),
+-- so date range queries read only partitions of their months and old tweets
+-- are removed by dropping partitions instead of DELETE. Latest tweets are
+-- read without date range, months keep count of partitions they plan and
+-- scan small, retention (`DB_PARTITIONS_RETENTION`) keeps it bounded.
+-- Unique keys of partitioned table must include partition key, tweet
+-- `created_at` never changes, so unique (api_id, published_at) still holds
+-- only one row per `api_id`.
 CREATE TABLE tweets (
-    id               serial PRIMARY KEY NOT NULL,
-    api_id           text NOT NULL UNIQUE,    -- from twitter hold only unique
+    id               bigserial NOT NULL,
+    api_id           text NOT NULL,           -- from twitter hold only unique
     published_at     timestamp not null,
     phrase           text not null,
     hashtags         text[],                  -- as array
     author_id        bigint not null,
-    query_id         bigint NOT NULL REFERENCES query (id)  -- task query phrase
-);
+    query_id         bigint NOT NULL REFERENCES query (id),  -- task query phrase
+    PRIMARY KEY (id, published_at),
+    UNIQUE (api_id, published_at)
+) PARTITION BY RANGE (published_at);
+-- Only index for reading, keyset (cursor) pagination of tweets by phrase
+-- takes every page straight from it.
+CREATE INDEX idx_tweets_query_published on tweets (query_id, published_at DESC, id DESC);
+-- Tweets are appended roughly in time order, tiny BRIN index narrows
+-- time ranges inside of partition.
+CREATE INDEX idx_tweets_published_brin on tweets USING brin (published_at);
 
 -- For improvement aggregating statistic for each queried phrase we will
 -- store unique (day, query_id, tag) hashtags per day (using partitions feature)
@@ -37,51 +70,117 @@ CREATE TABLE authors (
 ) PARTITION BY RANGE (published_at);
 CREATE UNIQUE INDEX idx_unique_authors on authors (published_at, query_id, author_id);
 
--- Function for creating partitions, you can run it when you will need more partition.
--- We do not create partitions automatically because it will increase cost for insertion time,
--- so do it manually or in applications logic by some periodic task.
+-- Do same and for tweets counters per day and per hour, counting tweets
+-- of date range sums at most one row per day instead of scanning tweets.
+-- Rows are few, so they are not partitioned, retention deletes rows
+-- of days which tweets partitions are dropped.
+CREATE TABLE tweets_daily (
+    published_at     date NOT NULL,
+    query_id         bigint NOT NULL REFERENCES query (id),
+    counter          bigint DEFAULT 1,
+    PRIMARY KEY (query_id, published_at)
+);
+CREATE TABLE tweets_hourly (
+    published_at     timestamp NOT NULL,          -- start of hour
+    query_id         bigint NOT NULL REFERENCES query (id),
+    counter          bigint DEFAULT 1,
+    PRIMARY KEY (query_id, published_at)
+);
+
+-- Function for creating partition of month of `statistic_day`.
+-- Partitions are not created by insert trigger, it would add cost to every
+-- insert. Application keeps partitions of next days created ahead
+-- and creates them for backfill days (`bg_tasks/partitions.py`),
+-- so function skips existing partition and serializes concurrent callers
+-- of application instances.
 CREATE OR REPLACE FUNCTION create_partitions(table_name text, statistic_day date) RETURNS VOID AS
 $BODY$
 DECLARE
     sql text;
+    month_start date := date_trunc('month', statistic_day)::date;
 BEGIN
- select format('CREATE TABLE %s_%s PARTITION OF %s
-  FOR VALUES FROM (''%s'') TO (''%s'')', table_name, (replace(statistic_day::text, '-', '_')), table_name, statistic_day, (statistic_day + INTERVAL '1 DAY')::date) into sql;
+ PERFORM pg_advisory_xact_lock(hashtext('partitions'));
+ select format('CREATE TABLE IF NOT EXISTS %s_%s PARTITION OF %s
+  FOR VALUES FROM (''%s'') TO (''%s'')', table_name, to_char(month_start, 'YYYY_MM'), table_name, month_start, (month_start + INTERVAL '1 MONTH')::date) into sql;
  EXECUTE sql;
 END;
 $BODY$
 LANGUAGE plpgsql;
 
--- Create partitions for table hashtags from 10 DAY in past to 1 YEAR in future over over each day.
-SELECT create_partitions('hashtags', statistic_day::date) FROM generate_series
-  (current_date - INTERVAL '10 DAY', current_date + INTERVAL '1 YEAR', '1 DAY'::interval) statistic_day;
+-- Function for dropping partitions of months ended by `before_day` by retention policy,
+-- it is cheap comparing with deleting rows. Returns count of dropped partitions.
+-- DROP waiting for lock of partition read by long export would block all
+-- reads of table queued behind it, so it gives up in a second and
+-- application retries it next period.
+CREATE OR REPLACE FUNCTION drop_partitions(table_name text, before_day date) RETURNS integer AS
+$BODY$
+DECLARE
+    partition_name text;
+    dropped integer := 0;
+BEGIN
+ PERFORM pg_advisory_xact_lock(hashtext('partitions'));
+ PERFORM set_config('lock_timeout', '1s', true);
+ FOR partition_name IN
+  SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+   WHERE i.inhparent = table_name::regclass
+    AND CASE WHEN c.relname ~ '_\d{4}_\d{2}$'
+     THEN to_date(right(c.relname, 7), 'YYYY_MM') + INTERVAL '1 MONTH' END <= before_day
+ LOOP
+  EXECUTE format('DROP TABLE %I', partition_name);
+  dropped := dropped + 1;
+ END LOOP;
+ RETURN dropped;
+END;
+$BODY$
+LANGUAGE plpgsql;
 
--- Create partitions for table authors from 10 DAY in past to 1 YEAR in future over over each day.
-SELECT create_partitions('authors', statistic_day::date) FROM generate_series
-  (current_date - INTERVAL '10 DAY', current_date + INTERVAL '1 YEAR', '1 DAY'::interval) statistic_day;
+-- Create partitions for tables tweets, hashtags and authors for months
+-- from 10 DAY in past to 30 DAY in future. Tweets are read without date
+-- range too, so every empty partition adds planning time, application keeps
+-- months of next `DB_PARTITIONS_AHEAD` days.
+SELECT create_partitions(table_name, statistic_day::date)
+  FROM unnest(ARRAY['tweets', 'hashtags', 'authors']) table_name,
+  generate_series(current_date - INTERVAL '10 DAY', current_date + INTERVAL '30 DAY', '1 DAY'::interval) statistic_day;
 
--- Triggers for hashtags and authors
+-- Triggers for hashtags, authors and tweets counters.
+-- Statement level trigger gets all rows inserted by statement as `new_tweets`
+-- transition table, aggregates them and upserts each counter row once per batch
+-- instead of one upsert per hashtag and author of each tweet.
+-- Counter row keeps tag spelling of it's first inserted tweet.
 CREATE OR REPLACE FUNCTION tweets_trigger() RETURNS trigger AS $tweets_trigger$
-    DECLARE
-    tag_item text;
     BEGIN
-        IF NEW.hashtags IS NOT NULL THEN
-             FOREACH tag_item IN ARRAY NEW.hashtags LOOP
-                INSERT INTO hashtags (published_at, query_id, tag)
-                  VALUES (NEW.published_at::date, NEW.query_id, tag_item)
-                  ON CONFLICT (published_at, query_id, lower(tag))
-                  DO UPDATE SET counter = hashtags.counter + 1;
-             END LOOP;
-        END IF;
-        INSERT INTO authors (published_at, query_id, author_id)
-          VALUES (NEW.published_at::date, NEW.query_id, NEW.author_id)
+        INSERT INTO hashtags (published_at, query_id, tag, counter)
+          SELECT t.published_at::date, t.query_id,
+                 (array_agg(h.tag ORDER BY t.id, h.ord))[1], count(*)
+            FROM new_tweets t, unnest(t.hashtags) WITH ORDINALITY h(tag, ord)
+            GROUP BY t.published_at::date, t.query_id, lower(h.tag)
+          ON CONFLICT (published_at, query_id, lower(tag))
+          DO UPDATE SET counter = hashtags.counter + EXCLUDED.counter;
+        INSERT INTO authors (published_at, query_id, author_id, counter)
+          SELECT published_at::date, query_id, author_id, count(*)
+            FROM new_tweets
+            GROUP BY published_at::date, query_id, author_id
           ON CONFLICT (published_at, query_id, author_id)
-          DO UPDATE SET counter = authors.counter + 1;
-        RETURN NEW;
+          DO UPDATE SET counter = authors.counter + EXCLUDED.counter;
+        INSERT INTO tweets_daily (published_at, query_id, counter)
+          SELECT published_at::date, query_id, count(*)
+            FROM new_tweets
+            GROUP BY published_at::date, query_id
+          ON CONFLICT (query_id, published_at)
+          DO UPDATE SET counter = tweets_daily.counter + EXCLUDED.counter;
+        INSERT INTO tweets_hourly (published_at, query_id, counter)
+          SELECT date_trunc('hour', published_at), query_id, count(*)
+            FROM new_tweets
+            GROUP BY date_trunc('hour', published_at), query_id
+          ON CONFLICT (query_id, published_at)
+          DO UPDATE SET counter = tweets_hourly.counter + EXCLUDED.counter;
+        RETURN NULL;
     END;
 $tweets_trigger$ LANGUAGE plpgsql;
 
--- Insert hashtags and authors only when we save unique tweets
--- to avoid duplication caunters for statistic.
-CREATE TRIGGER tweets_trigger AFTER INSERT OR UPDATE ON tweets
-    FOR EACH ROW EXECUTE FUNCTION tweets_trigger();
+-- Insert hashtags, authors and counters only when we save unique tweets
+-- to avoid duplication caunters for statistic, tweets skipped by
+-- `ON CONFLICT DO NOTHING` are not in `new_tweets`.
+CREATE TRIGGER tweets_trigger AFTER INSERT ON tweets
+    REFERENCING NEW TABLE AS new_tweets
+    FOR EACH STATEMENT EXECUTE FUNCTION tweets_trigger();
@@ -0,0 +1,151 @@
+"""Benchmark of `aiopg` and `asyncpg` engines on model queries.
+
+Run from `src` directory with app ENV vars::
+
+    python -m bench.engines --requests 2000 --concurrency 20
+
+Read queries run through the same model methods bypassing
+single-flight, so every call goes to DB. `copy` loads rows into
+temporary table of rolled back transaction, DB data is not changed.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Dict, List
+
+from db.base import AsyncDB
+from db.pg.engine import ENGINES
+from db.pg.models import Authors, Hashtags, Query, Tweets
+from web.settings import Settings
+
+
+class Rollback(Exception):
+    """Roll back benchmark transaction."""
+
+
+def unwrap(method: Callable) -> Callable:
+    """Return model method without single-flight."""
+    return getattr(method, "__wrapped__", method)
+
+
+async def measure(
+    call: Callable[[], Awaitable], requests: int, concurrency: int
+) -> Dict[str, float]:
+    """Run `call` `requests` times by `concurrency` workers."""
+    latencies: List[float] = []
+    left = iter(range(requests))
+
+    async def worker():
+        for _ in left:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def copy_rows(pg: AsyncDB, count: int) -> None:
+    """Load `count` tweets rows into temporary table and roll back."""
+    now = datetime.utcnow()
+    rows = [
+        {
+            "api_id": str(i),
+            "published_at": now - timedelta(seconds=i),
+            "phrase": "benchmark",
+            "hashtags": ["bench", "mark"],
+            "author_id": i % 100,
+            "query_id": 0,
+        }
+        for i in range(count)
+    ]
+    async with pg.acquire() as conn:
+        try:
+            async with conn.transaction():
+                await conn.execute(
+                    "CREATE TEMP TABLE tweets_bench "
+                    "(LIKE tweets INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                await conn.copy("tweets_bench", rows)
+                raise Rollback
+        except Rollback:
+            pass
+
+
+async def bench(
+    name: str, settings: Settings, requests: int, concurrency: int, rows: int
+) -> Dict[str, Dict[str, float]]:
+    """Run all cases on engine `name`."""
+    pg = ENGINES[name](settings, asyncio.get_event_loop())  # type: ignore
+    app: Dict = {}
+    await pg.startup(app)
+    try:
+        query_id = await Query.get_id(pg, settings.TWITTER_QUERY_PHRASE)
+        to_date = date.today().isoformat()
+        from_date = (date.today() - timedelta(days=7)).isoformat()
+        cases = {
+            "unique_tweets": lambda: unwrap(Tweets.unique_tweets)(
+                Tweets, pg, query_id, 100
+            ),
+            "tweets_after": lambda: unwrap(Tweets.tweets_after)(
+                Tweets, pg, query_id, 100
+            ),
+            "count_tweets": lambda: unwrap(Tweets.count_tweets)(
+                Tweets, pg, query_id, from_date, to_date
+            ),
+            "top_hashtags": lambda: unwrap(Hashtags.top)(
+                Hashtags, pg, query_id, from_date, to_date
+            ),
+            "top_authors": lambda: unwrap(Authors.top)(
+                Authors, pg, query_id, from_date, to_date
+            ),
+        }
+        results = {}
+        for case, call in cases.items():
+            await measure(call, concurrency, concurrency)  # warm up
+            results[case] = await measure(call, requests, concurrency)
+        copy_requests = max(requests // 100, 1)
+        result = await measure(lambda: copy_rows(pg, rows), copy_requests, 1)
+        result["rps"] *= rows
+        results[f"copy_{rows}_rows"] = result
+        return results
+    finally:
+        await pg.cleanup(app)
+
+
+def main() -> None:
+    """Print table of results of both engines."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES))
+    args = parser.parse_args()
+    settings = Settings()
+    loop = asyncio.get_event_loop()
+    print(
+        f"{'engine':<8} {'case':<18} {'rps':>10} {'p50 ms':>8} {'p99 ms':>8}"
+    )
+    for name in args.engines:
+        results = loop.run_until_complete(
+            bench(name, settings, args.requests, args.concurrency, args.rows)
+        )
+        for case, result in results.items():
+            print(
+                f"{name:<8} {case:<18} {result['rps']:>10.1f} "
+                f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
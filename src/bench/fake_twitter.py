@@ -0,0 +1,221 @@
+"""Fake Twitter API serving synthetic tweets.
+
+Local stand-in of `/oauth2/token` and `/1.1/search/tweets.json`
+for tests and benchmarks. Run it standalone and point app to it
+by `TWITTER_API_URL`::
+
+    python -m bench.fake_twitter --port 8889 --volume 10000
+"""
+
+import argparse
+import asyncio
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+from aiohttp.test_utils import unused_port
+
+from bg_tasks.snowflake import snowflake
+
+__all__ = ("FakeTwitter",)
+
+
+class FakeTwitter:
+    """Search API over synthetic tweets of any phrase.
+
+    Each phrase has `volume` tweets published `interval` seconds apart
+    before start and `rate` new tweets per second after it. Tweet ids
+    are snowflakes of publication time with phrase slot in low bits,
+    pages go back by `max_id` and stop at `since_id` as Twitter does.
+    Each search response is delayed by `latency` seconds and carries
+    `x-rate-limit-*` headers of `limit` requests per `window` seconds,
+    exceeded limit answers 429.
+    Only `phrases` have tweets if they are given.
+    """
+
+    def __init__(
+        self,
+        volume: int = 1000,
+        rate: float = 0,
+        interval: float = 60,
+        latency: float = 0,
+        limit: int = 180,
+        window: int = 900,
+        hashtags: int = 20,
+        authors: int = 100,
+        phrases: Optional[Set[str]] = None,
+    ) -> None:
+        """Make fake API, tweets are counted from now."""
+        self.volume = volume
+        self.rate = rate
+        self.interval = interval
+        self.latency = latency
+        self.limit = limit
+        self.window = window
+        self.hashtags = hashtags
+        self.authors = authors
+        self.phrases = phrases
+        self.started = time.time()
+        self.requests = 0
+        self.statuses = 0
+        self._window_start = self.started
+        self._used = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    def app(self) -> web.Application:
+        """Application with API routes."""
+        app = web.Application()
+        app.router.add_post("/oauth2/token", self.token)
+        app.router.add_get("/1.1/search/tweets.json", self.search)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve API on `port` or on free one, return it's base URL."""
+        port = port or unused_port()
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def token(self, request: web.Request) -> web.Response:
+        """Bearer token for any credentials."""
+        return web.json_response(
+            {"token_type": "bearer", "access_token": "fake-token"}
+        )
+
+    async def search(self, request: web.Request) -> web.Response:
+        """Page of newest tweets of `q` between `since_id` and `max_id`."""
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        allowed, headers = self._rate_limit()
+        if not allowed:
+            return web.json_response(
+                {"errors": [{"code": 88, "message": "Rate limit exceeded"}]},
+                status=429,
+                headers=headers,
+            )
+        phrase = request.query["q"]
+        count = min(int(request.query.get("count") or 15), 100)
+        slot = zlib.crc32(phrase.encode()) % 1024
+        top = self._newest() if self._has(phrase) else 0
+        if "max_id" in request.query:
+            top = self._number(int(request.query["max_id"]), slot, top)
+        bottom = 0
+        if "since_id" in request.query:
+            bottom = self._number(int(request.query["since_id"]), slot, top)
+        numbers = range(top, max(bottom, top - count), -1)
+        statuses = [self._tweet(phrase, slot, n) for n in numbers]
+        self.statuses += len(statuses)
+        metadata: Dict = {"count": count}
+        if top - count > bottom:
+            metadata["next_results"] = "?max_id={}&count={}".format(
+                statuses[-1]["id"] - 1, count
+            )
+        return web.json_response(
+            {"statuses": statuses, "search_metadata": metadata},
+            headers=headers,
+        )
+
+    def _has(self, phrase: str) -> bool:
+        """Check phrase has tweets."""
+        return self.phrases is None or phrase in self.phrases
+
+    def _newest(self) -> int:
+        """Number of the newest tweet of phrase."""
+        return self.volume + int(self.rate * (time.time() - self.started))
+
+    def _published(self, n: int) -> float:
+        """Timestamp of tweet number `n`."""
+        if n <= self.volume:
+            return self.started - (self.volume - n) * self.interval
+        return self.started + (n - self.volume) / self.rate
+
+    def _id(self, slot: int, n: int) -> int:
+        """Id of tweet number `n` of phrase `slot`."""
+        published = datetime.utcfromtimestamp(self._published(n))
+        return snowflake(published) + (slot << 12) + n % 4096
+
+    def _number(self, tweet_id: int, slot: int, top: int) -> int:
+        """Number of the newest tweet up to `top` with id `<= tweet_id`.
+
+        Return `0` if all tweets are newer.
+        """
+        low, high = 0, top
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._id(slot, middle) <= tweet_id:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def _tweet(self, phrase: str, slot: int, n: int) -> Dict:
+        """Tweet number `n` of phrase."""
+        published = datetime.utcfromtimestamp(self._published(n))
+        tweet_id = self._id(slot, n)
+        hashtags: List[Dict] = []
+        if self.hashtags:
+            hashtags.append({"text": f"tag{n % self.hashtags}"})
+        return {
+            "id": tweet_id,
+            "id_str": str(tweet_id),
+            "created_at": published.strftime("%a %b %d %H:%M:%S +0000 %Y"),
+            "text": f"{phrase} tweet {n}",
+            "entities": {"hashtags": hashtags},
+            "user": {"id": n % self.authors + 1},
+        }
+
+    def _rate_limit(self) -> Tuple[bool, Dict[str, str]]:
+        """Take request from window budget, return if it's allowed."""
+        now = time.time()
+        if now >= self._window_start + self.window:
+            self._window_start = now
+            self._used = 0
+        allowed = self._used < self.limit
+        if allowed:
+            self._used += 1
+        return (
+            allowed,
+            {
+                "x-rate-limit-limit": str(self.limit),
+                "x-rate-limit-remaining": str(self.limit - self._used),
+                "x-rate-limit-reset": str(
+                    int(self._window_start + self.window)
+                ),
+            },
+        )
+
+
+def main() -> None:
+    """Serve fake API forever."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8889)
+    parser.add_argument("--volume", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=0)
+    parser.add_argument("--interval", type=float, default=60)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--limit", type=int, default=180)
+    parser.add_argument("--window", type=int, default=900)
+    args = parser.parse_args()
+    fake = FakeTwitter(
+        volume=args.volume,
+        rate=args.rate,
+        interval=args.interval,
+        latency=args.latency,
+        limit=args.limit,
+        window=args.window,
+    )
+    web.run_app(fake.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
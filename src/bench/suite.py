@@ -0,0 +1,206 @@
+"""End-to-end benchmark of ingest and API on fake Twitter API.
+
+Run from `src` directory with app ENV vars::
+
+    python -m bench.suite --tweets 10000 --output bench.json
+    python -m bench.suite --baseline bench.json --tolerance 0.2
+
+App ingests `--tweets` synthetic tweets of new phrase from
+`bench.fake_twitter` into configured DB, then every `/api/v1` route
+is loaded by `--concurrency` clients, exports by no more clients
+than `DB_EXPORT_POOL_SIZE`, requests rejected by 503 are counted.
+Results are printed as JSON, with `--baseline` drops of throughput
+and growth of p99 latency beyond `--tolerance` are listed in
+`regressions` and exit code is 1.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from dataclasses import replace
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from bench.engines import measure
+from bench.fake_twitter import FakeTwitter
+from db.pg.models import Query
+from metrics import TWEETS_SAVE_LATENCY
+from web.app import create_app
+from web.routes import API_VERSION
+from web.settings import Settings
+
+# Results where higher is better, others are latencies.
+THROUGHPUT = ("rps", "tweets_per_sec")
+COMPARED = THROUGHPUT + ("p99_ms", "save_p99_ms")
+# Exports over `DB_EXPORT_POOL_SIZE` are rejected by 503.
+EXPORT_ROUTE = API_VERSION + "/tweets/export/{from_date}/{to_date}/"
+
+
+def route_urls(client: TestClient, cursor: str) -> Dict[str, str]:
+    """URL of each API GET route with sample path params."""
+    today = date.today()
+    params = {
+        "offset": "100",
+        "cursor": cursor,
+        "from_date": (today - timedelta(days=7)).isoformat(),
+        "to_date": today.isoformat(),
+        "kind": "hashtags",
+        "minutes": "15",
+    }
+    urls = {}
+    for route in client.server.app.router.routes():
+        canonical = route.resource.canonical
+        if route.method == "GET" and route.handler.__module__ == "web.api":
+            urls[canonical] = canonical.format(**params)
+    return urls
+
+
+async def ingest(
+    client: TestClient, query_id: int, tweets: int, timeout: float
+) -> Dict[str, float]:
+    """Wait for all tweets of `query_id` in DB, return ingest results."""
+    app = client.server.app
+    start = time.perf_counter()
+    saved = 0
+    while saved < tweets and time.perf_counter() - start < timeout:
+        await asyncio.sleep(0.1)
+        saved = await app["pg"].fetchval(
+            "SELECT count(*) FROM tweets WHERE query_id = :query_id",
+            dict(query_id=query_id),
+        )
+    elapsed = time.perf_counter() - start
+    return {
+        "tweets": saved,
+        "seconds": elapsed,
+        "tweets_per_sec": saved / elapsed,
+        "save_batches": TWEETS_SAVE_LATENCY.count(),
+        "save_p50_ms": TWEETS_SAVE_LATENCY.quantile(0.5) * 1000,
+        "save_p99_ms": TWEETS_SAVE_LATENCY.quantile(0.99) * 1000,
+    }
+
+
+async def load(
+    client: TestClient, requests: int, concurrency: int
+) -> Dict[str, Dict[str, float]]:
+    """Run concurrent GET requests of every route."""
+    resp = await client.get(f"{API_VERSION}/tweets/cursor/")
+    cursor = (await resp.json())["next"] or "-"
+    exports = client.server.app["settings"].DB_EXPORT_POOL_SIZE
+    results = {}
+    for route, url in route_urls(client, cursor).items():
+        clients = concurrency
+        if route == EXPORT_ROUTE:
+            clients = min(concurrency, exports)
+        rejected = []
+
+        async def call(url=url, rejected=rejected):
+            async with client.session.get(client.make_url(url)) as resp:
+                await resp.read()
+                assert resp.status in (200, 503), (url, resp.status)
+                if resp.status == 503:
+                    rejected.append(url)
+
+        await measure(call, clients, clients)  # warm up
+        rejected.clear()
+        results[route] = await measure(call, requests, clients)
+        results[route]["rejected"] = len(rejected)
+    return results
+
+
+async def bench(settings: Settings, args: argparse.Namespace) -> Dict:
+    """Serve fake API, ingest tweets by app and load it's API."""
+    phrase = f"bench {int(time.time())}"
+    fake = FakeTwitter(
+        volume=args.tweets,
+        interval=args.interval,
+        latency=args.latency / 1000,
+        limit=args.limit,
+        phrases={phrase},
+    )
+    settings = replace(
+        settings,
+        TWITTER_API_URL=await fake.start(),
+        TWITTER_QUERY_PHRASE=phrase,
+        TWITTER_LAST_TWEETS_COUNT=args.tweets,
+        TWITTER_RATE_LIMIT=args.limit,
+        LOGGING_LEVEL=40,
+    )
+    client = TestClient(TestServer(create_app(settings=settings)))
+    try:
+        await client.start_server()
+        query_id = await Query.save(client.server.app["pg"], phrase)
+        results: Dict[str, Any] = {
+            "meta": {
+                "engine": settings.DB_ENGINE,
+                "tweets": args.tweets,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "fake_latency_ms": args.latency,
+            },
+            "ingest": await ingest(
+                client, query_id, args.tweets, args.timeout
+            ),
+        }
+        results["ingest"]["api_requests"] = fake.requests
+        results["routes"] = await load(client, args.requests, args.concurrency)
+        return results
+    finally:
+        await client.close()
+        await fake.stop()
+
+
+def regressions(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Results worse than baseline by more than `tolerance` share."""
+    found = []
+    sections = [("ingest", results["ingest"], baseline.get("ingest", {}))]
+    for route, result in results["routes"].items():
+        sections.append((route, result, baseline["routes"].get(route, {})))
+    for name, result, base in sections:
+        for key in COMPARED:
+            if key not in result or not base.get(key):
+                continue
+            change = result[key] / base[key] - 1
+            if key in THROUGHPUT:
+                change = -change
+            if change > tolerance:
+                found.append(
+                    f"{name} {key}: {base[key]:.2f} -> {result[key]:.2f}"
+                )
+    return found
+
+
+def main() -> None:
+    """Print JSON results, exit with 1 on regressions."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--tweets", type=int, default=10000)
+    parser.add_argument("--interval", type=float, default=30)
+    parser.add_argument("--latency", type=float, default=0, help="ms")
+    parser.add_argument("--limit", type=int, default=100000)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    loop = asyncio.get_event_loop()
+    results = loop.run_until_complete(bench(Settings(), args))
+    if args.baseline:
+        with open(args.baseline) as fd:
+            results["regressions"] = regressions(
+                results, json.load(fd), args.tolerance
+            )
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as fd:
+            fd.write(text)
+    print(text)
+    sys.exit(1 if results.get("regressions") else 0)
+
+
+if __name__ == "__main__":
+    main()
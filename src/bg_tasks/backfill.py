@@ -0,0 +1,168 @@
+"""Historical backfill of phrase tweets.
+
+Run from `src` directory with app ENV vars::
+
+    python -m bg_tasks.backfill "Monty Python" 2019-09-01 2019-09-08
+
+Range is split into `--windows` time windows which are fetched by
+`--concurrency` tasks. Run it again with the same arguments to resume
+interrupted backfill, done windows are skipped. Backfill writes by
+ingest pool, so bulk merges are limited by ingest statement timeout.
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from bg_tasks.snowflake import snowflake
+from bg_tasks.twitter import AsyncTwitterAPI
+from db.base import AsyncDB
+from db.pg.engine import create_ingest_pg
+from db.pg.models import Backfill, Query, Tweets
+from metrics import TWEETS_FETCHED
+from web.settings import Settings
+
+__all__ = ("AsyncTwitterBackfill", "split")
+
+Window = Tuple[datetime, datetime]
+
+
+def split(start: datetime, end: datetime, count: int) -> List[Window]:
+    """Split `[start, end)` range into `count` equal windows."""
+    step = (end - start) / count
+    bounds = [start + step * i for i in range(count)] + [end]
+    return list(zip(bounds, bounds[1:]))
+
+
+class AsyncTwitterBackfill(AsyncTwitterAPI):
+    """Backfill of phrase tweets published in time range.
+
+    Tweet ids are snowflakes holding their creation time, so each
+    window is scrolled back from `max_id` of it's end down to `since_id`
+    of it's start. Windows are fetched by concurrent tasks sharing
+    rate limit budget, which is synced by response headers with
+    requests of live consumer. Rows are saved by `Tweets.bulk_threshold`
+    batches and window checkpoint moves to the next page after each
+    batch. Live consumer watermark `query.since_id` is not changed.
+
+    Standard search API keeps only recent days, older ranges are empty.
+    """
+
+    def __init__(self, settings: Settings, concurrency: int = 4) -> None:
+        """Make backfill of `concurrency` tasks."""
+        super().__init__(settings)
+        self._concurrency = concurrency
+
+    async def run(
+        self, pg: AsyncDB, phrase: str, windows: List[Window]
+    ) -> Dict[str, int]:
+        """Fetch not done `windows` of phrase, return totals.
+
+        Failed worker stops others before session is closed.
+        """
+        query_id = await Query.save(pg, phrase)
+        pending = await Backfill.plan(pg, query_id, windows)
+        totals = {"windows": len(windows), "pending": len(pending)}
+        totals.update(fetched=0, inserted=0)
+        queue: asyncio.Queue = asyncio.Queue()
+        for window in pending:
+            queue.put_nowait(window)
+        await self.create_session()
+        workers = [
+            asyncio.ensure_future(
+                self.worker(pg, query_id, phrase, queue, totals)
+            )
+            for _ in range(self._concurrency)
+        ]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await self.session.close()
+        return totals
+
+    async def worker(
+        self,
+        pg: AsyncDB,
+        query_id: int,
+        phrase: str,
+        queue: asyncio.Queue,
+        totals: Dict[str, int],
+    ) -> None:
+        """Fill windows from queue until it's empty."""
+        while not queue.empty():
+            fetched, inserted = await self.fill(
+                pg, query_id, phrase, queue.get_nowait()
+            )
+            totals["fetched"] += fetched
+            totals["inserted"] += inserted
+
+    async def fill(
+        self, pg: AsyncDB, query_id: int, phrase: str, window: Any
+    ) -> Tuple[int, int]:
+        """Scroll window from it's checkpoint, return fetched and inserted.
+
+        Checkpoint is stored only after rows of it's pages are saved.
+        """
+        bounds = (window["window_start"], window["window_end"])
+        since_id = snowflake(bounds[0]) - 1
+        max_id = window["max_id"] or snowflake(bounds[1]) - 1
+        fetched, inserted = window["fetched"], 0
+        rows: List[Dict] = []
+        logging.info("Backfill of %r from %s to %s.", phrase, *bounds)
+        if max_id > since_id:
+            async for tweets, _ in self.search_tweets(
+                phrase, since_id, max_id, sys.maxsize
+            ):
+                if not tweets:
+                    continue
+                TWEETS_FETCHED.inc(len(tweets))
+                rows.extend(Tweets.rows(query_id, tweets))
+                max_id = min(t.api_id for t in tweets) - 1
+                if len(rows) >= Tweets.bulk_threshold:
+                    inserted += len(await Tweets.save(pg, rows))
+                    fetched += len(rows)
+                    rows = []
+                    await Backfill.checkpoint(
+                        pg, query_id, bounds, max_id, fetched
+                    )
+        if rows:
+            inserted += len(await Tweets.save(pg, rows))
+            fetched += len(rows)
+        await Backfill.checkpoint(pg, query_id, bounds, max_id, fetched, True)
+        return fetched - window["fetched"], inserted
+
+
+def main() -> None:
+    """Backfill phrase and log totals."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("phrase")
+    parser.add_argument("start", type=datetime.fromisoformat, help="UTC")
+    parser.add_argument("end", type=datetime.fromisoformat, help="UTC")
+    parser.add_argument("--windows", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    settings = Settings()
+    logging.basicConfig(level=settings.LOGGING_LEVEL)
+    loop = asyncio.get_event_loop()
+    pg = create_ingest_pg(settings, loop)
+    app: Dict = {}
+    loop.run_until_complete(pg.startup(app))
+    try:
+        totals = loop.run_until_complete(
+            AsyncTwitterBackfill(settings, args.concurrency).run(
+                pg, args.phrase, split(args.start, args.end, args.windows)
+            )
+        )
+        logging.info("Backfill of %r is done: %s.", args.phrase, totals)
+    finally:
+        loop.run_until_complete(pg.cleanup(app))
+
+
+if __name__ == "__main__":
+    main()
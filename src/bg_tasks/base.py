@@ -1,9 +1,35 @@
 """Abstract base classes for providers like twitter, instagram, etc."""
 
+import asyncio
+import weakref
 from abc import ABC, abstractmethod
 from contextlib import asynccontextmanager
+from typing import Any
 
-__all__ = ("AsyncAPI", "AsyncConsumer", "AsyncTasks")
+__all__ = ("AsyncAPI", "AsyncConsumer", "AsyncTasks", "cancel", "sleep")
+
+# Tasks asked to stop by `cancel`.
+STOPPING: Any = weakref.WeakSet()
+
+
+async def sleep(delay: float) -> None:
+    """Sleep between runs of task loop, stop task asked to stop.
+
+    `asyncio.wait_for` drops cancellation when it's future is done
+    at the same moment, so loop of task which lost it stops here.
+    """
+    if asyncio.current_task() in STOPPING:
+        raise asyncio.CancelledError()
+    await asyncio.sleep(delay)
+
+
+async def cancel(task: asyncio.Future) -> None:
+    """Cancel task looping by `sleep` and wait until it's done."""
+    STOPPING.add(task)
+    task.cancel()
+    await asyncio.wait({task})
+    if not task.cancelled():
+        task.exception()
 
 
 class AsyncAPI(ABC):
@@ -20,8 +46,8 @@ class AsyncAPI(ABC):
 
     @asynccontextmanager
     @abstractmethod
-    async def rate_limit(self):
-        """Hold rate limit."""
+    async def rate_limit(self, key=None):
+        """Hold rate limit, `key` is shared budget consumer."""
 
 
 class AsyncConsumer(ABC):
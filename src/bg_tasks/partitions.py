@@ -0,0 +1,71 @@
+"""Rolling partitions of tweets and statistic tables."""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from aiohttp.web_app import Application
+
+from bg_tasks.base import AsyncTasks, cancel, sleep
+from db.pg.lock import AdvisoryLocks
+from db.pg.models import Partitions
+from web.settings import Settings
+
+__all__ = ("AsyncPartitionTasks",)
+
+
+class AsyncPartitionTasks(AsyncTasks):
+    """Keep monthly partitions created ahead and drop expired ones.
+
+    Once in `DB_PARTITIONS_PERIOD` seconds it creates partitions for
+    months of next `DB_PARTITIONS_AHEAD` days and drops partitions and
+    counters of rollups of months older than `DB_PARTITIONS_RETENTION`
+    days (`0` keeps them forever).
+    Only one app instance holding advisory lock does it.
+    Partitions for backfill days are created by `Tweets.save`.
+    """
+
+    lock_namespace: int = 2
+
+    def __init__(self, settings: Settings) -> None:
+        """Make partitions task."""
+        self._ahead: int = settings.DB_PARTITIONS_AHEAD
+        self._retention: int = settings.DB_PARTITIONS_RETENTION
+        self._period: int = settings.DB_PARTITIONS_PERIOD
+
+    async def maintain(self, app: Application) -> None:
+        """Create partitions ahead and drop expired ones."""
+        today = datetime.utcnow().date()
+        await Partitions.ensure(
+            app["pg_ingest"],
+            (today + timedelta(i) for i in range(self._ahead + 1)),
+        )
+        if self._retention:
+            dropped = await Partitions.drop_before(
+                app["pg_ingest"], today - timedelta(self._retention)
+            )
+            logging.debug("Dropped %s expired partitions.", dropped)
+
+    async def run_forever(self, app: Application) -> None:
+        """Maintain partitions forever while holding the lock."""
+        locks = AdvisoryLocks(app["pg_ingest"], self.lock_namespace)
+        try:
+            while True:
+                try:
+                    if await locks.sync([0]):
+                        await self.maintain(app)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:  # noqa pylint: disable=broad-except
+                    logging.exception("Partitions maintenance failed.")
+                await sleep(self._period)
+        finally:
+            await locks.close()
+
+    async def startup_bg_tasks(self, app: Application) -> None:
+        """Create new asyncio task maintaining partitions."""
+        app["partitions_task"] = app.loop.create_task(self.run_forever(app))
+
+    async def cleanup_bg_tasks(self, app: Application) -> None:
+        """Cancel asyncio task."""
+        await cancel(app["partitions_task"])
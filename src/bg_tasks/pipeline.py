@@ -0,0 +1,155 @@
+"""Fetch/write pipeline between consumers and DB."""
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from bg_tasks.base import cancel, sleep
+
+__all__ = ("WritePipeline",)
+
+
+class WritePipeline:
+    """Bounded queue of normalized rows drained by writer tasks.
+
+    Fetchers `put` pages of rows and go on fetching, writers coalesce
+    pages into batches up to `batch_size` rows or `batch_timeout`
+    seconds and `save` each batch at once. When DB falls behind queue
+    gets full and `put` waits, so fetching slows down instead of
+    growing memory. Result of `save` (inserted rows) is passed
+    to `saved` callback of `start`.
+    """
+
+    def __init__(
+        self,
+        save: Callable[[Any, List[Dict]], Awaitable],
+        queue_size: int,
+        batch_size: int,
+        batch_timeout: float,
+        writers: int = 1,
+    ) -> None:
+        """Make pipeline, writers are started by `start`."""
+        self._save = save
+        self._queue: asyncio.Queue
+        self._queue_size = queue_size
+        self._batch_size = batch_size
+        self._batch_timeout = batch_timeout
+        self._writers_count = writers
+        self._writers: List[asyncio.Task] = []
+        self._saved: Optional[Callable[[Any], Awaitable]] = None
+        self._pending: Dict[int, int] = defaultdict(int)
+        self._drained: Dict[int, asyncio.Event] = {}
+        self._failed: Set[int] = set()
+        self._batches: int = 0
+        self._rows: int = 0
+        self._last_batch_size: int = 0
+        self._max_batch_size: int = 0
+
+    def start(
+        self, pg: Any, saved: Optional[Callable[[Any], Awaitable]] = None
+    ) -> None:
+        """Start writer tasks saving into `pg`."""
+        self._saved = saved
+        self._queue = asyncio.Queue(maxsize=self._queue_size)
+        self._writers = [
+            asyncio.ensure_future(self._writer(pg))
+            for _ in range(self._writers_count)
+        ]
+
+    async def stop(self) -> None:
+        """Stop writers, not saved rows are fetched again later.
+
+        Watermarks of their keys were not moved, see `written`.
+        """
+        await asyncio.gather(*(cancel(writer) for writer in self._writers))
+
+    async def put(self, key: int, rows: List[Dict]) -> None:
+        """Put page of `key` rows, wait while queue is full.
+
+        Page is pending only once it's queued, so `put` cancelled while
+        waiting does not block `written` of the key.
+        """
+        await self._queue.put((key, rows))
+        self._pending[key] += 1
+
+    async def written(self, key: int) -> bool:
+        """Wait until all `key` rows are written.
+
+        Return `False` if some of them failed since previous call.
+        """
+        while self._pending.get(key):
+            event = self._drained.setdefault(key, asyncio.Event())
+            await event.wait()
+        ok = key not in self._failed
+        self._failed.discard(key)
+        return ok
+
+    async def _call_saved(self, result: Any) -> None:
+        """Pass result of `save` to `saved`, it's failure is only logged."""
+        if self._saved is None:
+            return
+        try:
+            await self._saved(result)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa pylint: disable=broad-except
+            logging.exception("Saved batch is not handled.")
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and batch sizes."""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_size": self._queue_size,
+            "batches": self._batches,
+            "rows": self._rows,
+            "last_batch_size": self._last_batch_size,
+            "max_batch_size": self._max_batch_size,
+            "avg_batch_size": self._rows / (self._batches or 1),
+        }
+
+    async def _batch(self) -> List[Tuple[int, List[Dict]]]:
+        """Wait for first page and coalesce next pages by size or time."""
+        loop = asyncio.get_event_loop()
+        batch = [await self._queue.get()]
+        size = len(batch[0][1])
+        deadline = loop.time() + self._batch_timeout
+        while size < self._batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[1])
+        return batch
+
+    async def _writer(self, pg: Any) -> None:
+        """Save batches forever."""
+        while True:
+            await sleep(0)
+            batch = await self._batch()
+            rows = [row for _, page in batch for row in page]
+            try:
+                result = await self._save(pg, rows)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa pylint: disable=broad-except
+                logging.exception("Batch of %s rows is not saved.", len(rows))
+                self._failed.update(key for key, _ in batch)
+            else:
+                await self._call_saved(result)
+            self._batches += 1
+            self._rows += len(rows)
+            self._last_batch_size = len(rows)
+            self._max_batch_size = max([self._max_batch_size, len(rows)])
+            logging.debug("WritePipeline %s", self.stats())
+            for key, _ in batch:
+                self._pending[key] -= 1
+                if not self._pending[key]:
+                    del self._pending[key]
+                    event = self._drained.pop(key, None)
+                    if event:
+                        event.set()
@@ -0,0 +1,76 @@
+"""Rate limits for providers API."""
+
+import asyncio
+import time
+from typing import Mapping
+
+__all__ = ("TokenBucket",)
+
+
+class TokenBucket:
+    """Token bucket synced with `x-rate-limit-*` response headers.
+
+    Bucket holds up to `capacity` tokens and refills them evenly over
+    `window` seconds, so requests go out in bursts while budget remains.
+    Each response corrects it by `x-rate-limit-remaining` and when
+    budget is exhausted (or on 429) all requests wait exactly until
+    `x-rate-limit-reset`. Safe for concurrent coroutines.
+    """
+
+    def __init__(self, capacity: int, window: float) -> None:
+        """Make full bucket."""
+        self._capacity: float = capacity
+        self._rate: float = capacity / window
+        self._window: float = window
+        self._tokens: float = capacity
+        self._updated: float = time.time()
+        self._reset: float = 0
+        self._blocked_until: float = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        """Add tokens for time passed since last refill."""
+        if self._blocked_until and now >= self._blocked_until:
+            # Limit was reset, window starts with full budget.
+            self._tokens = self._capacity
+            self._blocked_until = 0
+        self._tokens = min(
+            [self._capacity, self._tokens + (now - self._updated) * self._rate]
+        )
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Take one token, wait for it if bucket is empty."""
+        async with self._lock:
+            while True:
+                now = time.time()
+                if self._blocked_until > now:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    def update(self, status: int, headers: Mapping[str, str]) -> None:
+        """Sync bucket with API response status and rate limit headers."""
+        now = time.time()
+        self._refill(now)
+        remaining = headers.get("x-rate-limit-remaining")
+        reset = headers.get("x-rate-limit-reset")
+        reset_at = float(reset) if reset else now + self._window
+        if status == 429:
+            self._tokens = 0
+            self._blocked_until = max([self._blocked_until, reset_at])
+            return
+        if remaining is None:
+            return
+        if reset_at > self._reset:
+            # New window, API gave fresh budget.
+            self._tokens = float(remaining)
+            self._reset = reset_at
+        else:
+            self._tokens = min([self._tokens, float(remaining)])
+        if not int(remaining):
+            self._blocked_until = max([self._blocked_until, reset_at])
@@ -0,0 +1,71 @@
+"""Weighted fair scheduler for sharing one API request budget."""
+
+import asyncio
+import heapq
+import itertools
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from bg_tasks.base import cancel
+
+__all__ = ("FairScheduler",)
+
+
+class FairScheduler:
+    """Stride scheduler, gives request slots to keys weighted by priority.
+
+    Slot is taken from `slot` coroutine (rate limit) first, and only
+    then it is given to the waiter with the smallest `pass`, so every
+    key which waits at that moment takes part in the choice. Each
+    granted slot moves key's `pass` forward by `1 / priority`, so
+    while all keys are busy a key with priority 2 gets twice
+    as many requests as a key with priority 1.
+    """
+
+    def __init__(self, slot: Callable[[], Awaitable]) -> None:
+        """Make empty scheduler over `slot` source."""
+        self._slot = slot
+        self._strides: Dict[Hashable, float] = {}
+        self._passes: Dict[Hashable, float] = {}
+        self._waiters: List[Tuple[float, int, Hashable, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._vtime: float = 0
+        self._pump: Optional[asyncio.Task] = None
+
+    def register(self, key: Hashable, priority: int = 1) -> None:
+        """Add key or change it's priority."""
+        self._strides[key] = 1 / max([priority, 1])
+
+    def unregister(self, key: Hashable) -> None:
+        """Forget key."""
+        self._strides.pop(key, None)
+        self._passes.pop(key, None)
+
+    async def acquire(self, key: Hashable = None) -> None:
+        """Wait until key gets request slot."""
+        # Idle key must not bank slots, it rejoins at current virtual time.
+        pass_ = max([self._passes.get(key, 0), self._vtime])
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(
+            self._waiters, (pass_, next(self._counter), key, future)
+        )
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.ensure_future(self._run_pump())
+        await future
+
+    async def stop(self) -> None:
+        """Stop pump, it may wait for slot up to rate limit window."""
+        if self._pump is not None:
+            await cancel(self._pump)
+
+    async def _run_pump(self) -> None:
+        """Take slots and grant them while somebody waits."""
+        while self._waiters:
+            await self._slot()
+            while self._waiters:
+                pass_, _, key, future = heapq.heappop(self._waiters)
+                if future.cancelled():
+                    continue
+                self._vtime = pass_
+                self._passes[key] = pass_ + self._strides.get(key, 1)
+                future.set_result(None)
+                break
@@ -0,0 +1,210 @@
+"""Streaming parser of Twitter search pages."""
+
+import codecs
+import json
+import re
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+__all__ = ("SearchPage", "Tweet")
+
+# Keys of search page objects which make `Tweet` or `next_results`,
+# values of other keys (users, entities, metadata) are dropped.
+FIELDS = frozenset(
+    (
+        "id",
+        "created_at",
+        "text",
+        "entities",
+        "hashtags",
+        "user",
+        "next_results",
+    )
+)
+SPACES = re.compile(r"\s*")
+# Parser states: top level object key, it's value, `statuses` item.
+KEY, VALUE, STATUS, DONE = range(4)
+# Value which is not complete in buffer yet.
+MISSING = object()
+MONTHS = {
+    name: number
+    for number, name in enumerate(
+        "Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split(), 1
+    )
+}
+
+
+def project(pairs: List[Tuple[str, Any]]) -> dict:
+    """Make JSON object of `FIELDS` only."""
+    return {key: value for key, value in pairs if key in FIELDS}
+
+
+def parse_created_at(value: str) -> datetime:
+    """Parse API time `Tue Sep 03 21:31:33 +0000 2019` into naive UTC.
+
+    Format is fixed, so fields are cut by position, it's several
+    times faster than `strptime`.
+    """
+    if value[20:25] != "+0000":
+        raise ValueError(f"Time is not UTC: {value!r}")
+    return datetime(
+        int(value[26:]),
+        MONTHS[value[4:7]],
+        int(value[8:10]),
+        int(value[11:13]),
+        int(value[14:16]),
+        int(value[17:19]),
+    )
+
+
+class Tweet:
+    """API tweet projected into stored fields.
+
+    `created_at` is parsed once, UTC is stored as naive datetime.
+    """
+
+    __slots__ = ("api_id", "created_at", "text", "hashtags", "author_id")
+
+    def __init__(
+        self,
+        api_id: int,
+        created_at: datetime,
+        text: str,
+        hashtags: Tuple[str, ...],
+        author_id: int,
+    ) -> None:
+        """Make tweet record."""
+        self.api_id = api_id
+        self.created_at = created_at
+        self.text = text
+        self.hashtags = hashtags
+        self.author_id = author_id
+
+    @classmethod
+    def from_status(cls, status: dict) -> "Tweet":
+        """Make tweet of projected API status."""
+        return cls(
+            status["id"],
+            parse_created_at(status["created_at"]),
+            status["text"],
+            tuple(tag["text"] for tag in status["entities"]["hashtags"]),
+            status["user"]["id"],
+        )
+
+    def __repr__(self) -> str:
+        """Return tweet id and time."""
+        return f"Tweet({self.api_id}, {self.created_at})"
+
+
+class SearchPage:
+    """Incremental parser of `search/tweets.json` response body.
+
+    Body is fed by chunks as they arrive, each chunk returns `Tweet`
+    records of `statuses` completed by it. Statuses are decoded one
+    by one and their objects keep only `FIELDS` keys, so page object
+    tree is never built. Nested objects of status (user, entities,
+    retweeted status) are still decoded before their keys are
+    dropped, and status cut by chunk end is decoded again from it's
+    start by next `feed`. `next_results` of `search_metadata` is kept
+    after the page is parsed.
+    """
+
+    def __init__(self) -> None:
+        """Make parser of one page."""
+        self.next_results: Optional[str] = None
+        self._decoder = json.JSONDecoder(object_pairs_hook=project)
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._state = KEY
+        self._key = ""
+        self._statuses = False
+
+    def feed(self, chunk: bytes) -> List[Tweet]:
+        """Parse next chunk of body, return completed tweets."""
+        buffer, pos = self._buffer, self._pos
+        self._buffer = buffer[pos:] + self._text.decode(chunk, self._eof)
+        self._pos = 0
+        tweets: List[Tweet] = []
+        steps = {KEY: self._key_step, VALUE: self._value_step}
+        steps[STATUS] = self._status_step
+        while self._state != DONE:
+            spaces = SPACES.match(self._buffer, self._pos)
+            assert spaces is not None  # `\s*` matches empty string
+            self._pos = spaces.end()
+            if self._pos == len(self._buffer):
+                break
+            if not steps[self._state](self._buffer[self._pos], tweets):
+                break
+        return tweets
+
+    def close(self) -> List[Tweet]:
+        """Parse the rest of body, raise `ValueError` if it's cut."""
+        self._eof = True
+        tweets = self.feed(b"")
+        if self._state != DONE or not self._statuses:
+            raise ValueError("Search page is incomplete.")
+        return tweets
+
+    def _key_step(self, char: str, tweets: List[Tweet]) -> bool:
+        """Parse key or bound of top level object."""
+        if char in "{,":
+            self._pos += 1
+        elif char == "}":
+            self._pos += 1
+            self._state = DONE
+        else:
+            key = self._decode()
+            if key is MISSING:
+                return False
+            self._key = key
+            self._state = VALUE
+        return True
+
+    def _value_step(self, char: str, tweets: List[Tweet]) -> bool:
+        """Parse value of top level key, enter `statuses` array."""
+        if char == ":":
+            self._pos += 1
+        elif self._key == "statuses":
+            self._statuses = True
+            self._state = STATUS
+        else:
+            value = self._decode()
+            if value is MISSING:
+                return False
+            if self._key == "search_metadata" and value:
+                self.next_results = value.get("next_results")
+            self._state = KEY
+        return True
+
+    def _status_step(self, char: str, tweets: List[Tweet]) -> bool:
+        """Parse next status of `statuses` array into tweet."""
+        if char in "[,":
+            self._pos += 1
+        elif char == "]":
+            self._pos += 1
+            self._state = KEY
+        else:
+            status = self._decode()
+            if status is MISSING:
+                return False
+            tweets.append(Tweet.from_status(status))
+        return True
+
+    def _decode(self) -> Any:
+        """Decode next JSON value, return `MISSING` if it's not complete.
+
+        Value is complete when a delimiter follows it, so number
+        cut by chunk end is not taken.
+        """
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if self._eof:
+                raise
+            return MISSING
+        if end == len(self._buffer) and not self._eof:
+            return MISSING
+        self._pos = end
+        return value
@@ -0,0 +1,18 @@
+"""Twitter snowflake ids."""
+
+from datetime import datetime, timezone
+
+__all__ = ("TWEPOCH", "snowflake")
+
+# Start of Twitter snowflake ids, ms since UNIX epoch.
+TWEPOCH = 1288834974657
+
+
+def snowflake(moment: datetime) -> int:
+    """Return the smallest tweet id of UTC `moment`.
+
+    Tweet id holds it's creation time in ms above 22 low bits.
+    """
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (int(moment.timestamp() * 1000) - TWEPOCH) << 22
@@ -0,0 +1,279 @@
+"""Streaming top hashtags and authors over recent time windows."""
+
+import asyncio
+import json
+import logging
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from aiohttp.web_app import Application
+
+from bg_tasks.base import AsyncTasks, cancel, sleep
+from db.pg.models import Tweets
+from db.pg.notify import Notifications
+from web.settings import Settings
+
+__all__ = ("SpaceSaving", "WindowTopK", "HeavyHitters")
+
+
+class SpaceSaving:
+    """Space-Saving summary of stream with `k` counters.
+
+    For stream of `total` items estimated count of monitored item
+    is never less than it's true count and never greater than
+    true count plus `total / k`. Any item with true count greater
+    than `total / k` is monitored. Items are kept in min-heap
+    by counters, so count and eviction take `O(log k)`.
+    """
+
+    __slots__ = ("k", "counters", "total", "_heap", "_index")
+
+    def __init__(self, k: int) -> None:
+        """Make empty summary."""
+        self.k = k
+        self.counters: Dict[Hashable, int] = {}
+        self.total: int = 0
+        self._heap: List[Hashable] = []
+        self._index: Dict[Hashable, int] = {}
+
+    def add(self, item: Hashable, count: int = 1) -> None:
+        """Count item, replace the least counted item if it is full."""
+        self.total += count
+        if item in self.counters:
+            self.counters[item] += count
+            self._sift_down(self._index[item])
+        elif len(self.counters) < self.k:
+            self.counters[item] = count
+            self._heap.append(item)
+            self._sift_up(len(self._heap) - 1)
+        else:
+            least = self._heap[0]
+            del self._index[least]
+            self.counters[item] = self.counters.pop(least) + count
+            self._heap[0] = item
+            self._sift_down(0)
+
+    def _sift_up(self, pos: int) -> None:
+        """Move item at `pos` up to it's place in heap."""
+        heap, counters = self._heap, self.counters
+        item = heap[pos]
+        while pos:
+            parent = (pos - 1) // 2
+            if counters[heap[parent]] <= counters[item]:
+                break
+            heap[pos] = heap[parent]
+            self._index[heap[pos]] = pos
+            pos = parent
+        heap[pos] = item
+        self._index[item] = pos
+
+    def _sift_down(self, pos: int) -> None:
+        """Move item at `pos` down to it's place in heap."""
+        heap, counters = self._heap, self.counters
+        item = heap[pos]
+        while 2 * pos + 1 < len(heap):
+            child = 2 * pos + 1
+            if (
+                child + 1 < len(heap)
+                and counters[heap[child + 1]] < counters[heap[child]]
+            ):
+                child += 1
+            if counters[item] <= counters[heap[child]]:
+                break
+            heap[pos] = heap[child]
+            self._index[heap[pos]] = pos
+            pos = child
+        heap[pos] = item
+        self._index[item] = pos
+
+
+class WindowTopK:
+    """Sliding window of Space-Saving summaries, one per time bucket.
+
+    Memory is bounded by `k * window / bucket` counters. Counts of
+    window are sums of bucket counts, so estimated count of item
+    differs from true one by at most `total / k`, where `total`
+    is count of items in window.
+    """
+
+    def __init__(self, k: int, window: int, bucket: int = 60) -> None:
+        """Make empty window of `window` seconds."""
+        self._k = k
+        self._window = window
+        self._bucket = bucket
+        self._buckets: Dict[int, SpaceSaving] = {}
+
+    def add(
+        self, timestamp: float, item: Hashable, now: float, count: int = 1
+    ) -> None:
+        """Count item happened at `timestamp`, skip items out of window."""
+        index = int(timestamp // self._bucket)
+        if index < int((now - self._window) // self._bucket):
+            return
+        if index not in self._buckets:
+            self._buckets[index] = SpaceSaving(self._k)
+        self._buckets[index].add(item, count)
+
+    def expire(self, now: float) -> None:
+        """Drop buckets out of window."""
+        oldest = int((now - self._window) // self._bucket)
+        for index in [i for i in self._buckets if i < oldest]:
+            del self._buckets[index]
+
+    def top(
+        self, count: int, seconds: int, now: float
+    ) -> Tuple[List[Tuple[Hashable, int]], int]:
+        """Return top `count` items of last `seconds` and error bound."""
+        oldest = int((now - seconds) // self._bucket)
+        counters: Dict[Hashable, int] = defaultdict(int)
+        total = 0
+        for index, summary in self._buckets.items():
+            if index < oldest:
+                continue
+            total += summary.total
+            for item, counter in summary.counters.items():
+                counters[item] += counter
+        items = sorted(counters.items(), key=lambda i: i[1], reverse=True)
+        return items[:count], total // self._k
+
+
+class HeavyHitters(AsyncTasks):
+    """In-process top hashtags and authors of each query phrase.
+
+    Ingest process counts tweets rows it has inserted by `saved`
+    and publishes counts aggregated by minute into channel `topk`
+    of `Notifications`, so every process (gunicorn worker) counts
+    them by `receive` without reading DB. Window is loaded from rows
+    published in it on startup and when messages may be lost, counts
+    of rows saved during loading may be doubled. Queries are answered
+    from memory.
+    """
+
+    kinds: Tuple[str, str] = ("hashtags", "authors")
+    channel: str = "topk"
+    # Messages stay below 8000 bytes of PG `NOTIFY` payload.
+    message_size: int = 7000
+
+    def __init__(
+        self, settings: Settings, notifications: Optional[Notifications] = None
+    ) -> None:
+        """Make empty heavy hitters, load window by `startup_bg_tasks`."""
+        self._k: int = settings.TOPK_COUNTERS
+        self._window: int = settings.TOPK_WINDOW * 60
+        self._period: int = settings.TOPK_PERIOD
+        self._windows: Dict[Tuple[int, str], WindowTopK] = {}
+        self._notifications = notifications
+        self._stale = True
+        if notifications is not None:
+            notifications.subscribe(self.channel, self.receive)
+
+    def top(
+        self, query_id: Optional[int], kind: str, minutes: int, count: int = 3
+    ) -> List[Dict]:
+        """Top `count` items of `kind` for `query_id` in last `minutes`.
+
+        Each `counter` differs from true one by at most `error`.
+        """
+        if query_id is None:
+            return []
+        window = self._windows.get((query_id, kind))
+        if window is None:
+            return []
+        items, error = window.top(count, minutes * 60, time.time())
+        name = "tag" if kind == "hashtags" else "author_id"
+        return [
+            {name: item, "counter": counter, "error": error}
+            for item, counter in items
+        ]
+
+    async def saved(self, rows: List[Dict]) -> None:
+        """Count inserted rows in all processes."""
+        for message in self.messages(rows):
+            if self._notifications is None:
+                self.receive(message)
+            else:
+                await self._notifications.publish(self.channel, message)
+
+    def messages(self, rows: Iterable[Any]) -> Iterator[str]:
+        """Make messages of rows counts by query, kind and minute."""
+        counts: Dict[Tuple[int, str, int], Counter] = defaultdict(Counter)
+        for row in rows:
+            published_at = row["published_at"].replace(tzinfo=timezone.utc)
+            minute = int(published_at.timestamp()) // 60 * 60
+            counts[row["query_id"], "authors", minute][row["author_id"]] += 1
+            for tag in row["hashtags"] or []:
+                counts[row["query_id"], "hashtags", minute][tag.lower()] += 1
+        for (query_id, kind, minute), counter in counts.items():
+            items: List[Tuple[Hashable, int]] = []
+            size = 0
+            for item, count in counter.items():
+                items.append((item, count))
+                size += len(json.dumps(item)) + 16
+                if size >= self.message_size:
+                    yield json.dumps([query_id, kind, minute, items])
+                    items, size = [], 0
+            if items:
+                yield json.dumps([query_id, kind, minute, items])
+
+    def receive(self, message: Optional[str]) -> None:
+        """Count message of `messages`, `None` reloads window."""
+        if message is None:
+            self._stale = True
+            return
+        query_id, kind, minute, items = json.loads(message)
+        window = self._window_of(query_id, kind)
+        now = time.time()
+        for item, count in items:
+            window.add(minute, item, now, count)
+
+    async def load(self, app: Application) -> None:
+        """Count rows published in window instead of current counts."""
+        self._stale = False
+        now = time.time()
+        since = datetime.utcfromtimestamp(now - self._window)
+        rows = await Tweets.recent(app["pg_ingest"], since)
+        self._windows = {}
+        for message in self.messages(rows):
+            self.receive(message)
+
+    async def follow(self, app: Application) -> None:
+        """Expire old minutes and reload window when it's stale."""
+        while True:
+            try:
+                if self._stale:
+                    await self.load(app)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa pylint: disable=broad-except
+                self._stale = True
+                logging.exception("HeavyHitters load failed.")
+            now = time.time()
+            for window in self._windows.values():
+                window.expire(now)
+            await sleep(self._period)
+
+    async def startup_bg_tasks(self, app: Application) -> None:
+        """Create task following tweets."""
+        app["heavy_hitters_task"] = app.loop.create_task(self.follow(app))
+
+    async def cleanup_bg_tasks(self, app: Application) -> None:
+        """Cancel task."""
+        await cancel(app["heavy_hitters_task"])
+
+    def _window_of(self, query_id: int, kind: str) -> WindowTopK:
+        """Get window of query and kind, make new one if it is absent."""
+        key = (query_id, kind)
+        if key not in self._windows:
+            self._windows[key] = WindowTopK(self._k, self._window)
+        return self._windows[key]
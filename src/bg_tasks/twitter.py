@@ -4,13 +4,25 @@ import asyncio
 import logging
 import time
 from contextlib import asynccontextmanager
-from typing import Any, AsyncGenerator, Dict, Union
+from datetime import date
+from typing import Any, AsyncGenerator, Dict, List, Optional, Set, Tuple
 
 import aiohttp
 from aiohttp.web_app import Application
 
-from bg_tasks.base import AsyncAPI, AsyncConsumer, AsyncTasks
+from bg_tasks.base import AsyncAPI, AsyncConsumer, AsyncTasks, cancel, sleep
+from bg_tasks.pipeline import WritePipeline
+from bg_tasks.rate_limit import TokenBucket
+from bg_tasks.scheduler import FairScheduler
+from bg_tasks.search import SearchPage, Tweet
+from db.pg.lock import AdvisoryLocks
 from db.pg.models import Query, Tweets
+from metrics import (
+    RATE_LIMIT_WAIT,
+    TWEETS_FETCHED,
+    TWITTER_LATENCY,
+    TWITTER_REQUESTS,
+)
 from web.settings import Settings
 
 __all__ = ("AsyncTwitterAPI", "AsyncTwitterConsumer", "AsyncTwitterTasks")
@@ -19,22 +31,25 @@ __all__ = ("AsyncTwitterAPI", "AsyncTwitterConsumer", "AsyncTwitterTasks")
 class AsyncTwitterAPI(AsyncAPI):
     """Twitter API."""
 
-    api_url: str = "https://api.twitter.com"
-    token_url: str = f"{api_url}/oauth2/token"
-    tweets_url: str = f"{api_url}/1.1/search/tweets.json"
-
     def __init__(self, settings: Settings) -> None:
         """Make async twitter API."""
+        self.api_url: str = settings.TWITTER_API_URL.rstrip("/")
+        self.token_url: str = f"{self.api_url}/oauth2/token"
+        self.tweets_url: str = f"{self.api_url}/1.1/search/tweets.json"
         self._access_token: str
-        self._session: aiohttp.ClientSession
+        self._session: Optional[aiohttp.ClientSession] = None
         self._auth_headers: dict
-        self._last_request_time: float = 0
         self._basic_auth = aiohttp.BasicAuth(
             settings.TWITTER_CONSUMER_KEY, settings.TWITTER_CONSUMER_SECRET
         )
         self._query_phrase: str = settings.TWITTER_QUERY_PHRASE
         self._last_tweets_count: int = settings.TWITTER_LAST_TWEETS_COUNT
         self._task_period: int = settings.TWITTER_TASK_PERIOD
+        self._leader_period: int = settings.TWITTER_LEADER_PERIOD
+        self._limiter = TokenBucket(
+            settings.TWITTER_RATE_LIMIT, settings.TWITTER_RATE_WINDOW
+        )
+        self._scheduler = FairScheduler(self._limiter.acquire)
 
     async def create_session(self) -> None:
         """Initialize session."""
@@ -49,14 +64,19 @@ class AsyncTwitterAPI(AsyncAPI):
         return self._session
 
     @asynccontextmanager
-    async def rate_limit(self) -> AsyncGenerator[None, None]:
+    async def rate_limit(
+        self, key: Optional[str] = None
+    ) -> AsyncGenerator[None, None]:
         """Twetter API limits requests - 15-min window (user auth) = 180.
 
-        It is 1 req per 5 sec.
+        Requests are taken from `self._limiter` token bucket, synced
+        by response headers. Budget is shared by all phrases,
+        `self._scheduler` gives request slots to phrases (`key`)
+        weighted by their priority. Wait for slot is measured.
         """
-        if time.time() - self._last_request_time < 300:  # it is 5 sec
-            await asyncio.sleep(5)
-        self._last_request_time = time.time()
+        start = time.perf_counter()
+        await self._scheduler.acquire(key)
+        RATE_LIMIT_WAIT.observe(time.perf_counter() - start)
         yield
 
     async def token(self) -> None:
@@ -73,65 +93,194 @@ class AsyncTwitterAPI(AsyncAPI):
                     res = await resp.json()
                     self._access_token = res["access_token"]
 
-    async def search_tweets(self) -> AsyncGenerator[Any, Union[Dict, None]]:
-        """Scroll back (in past) for `self._last_tweets_count` tweets."""
-        count: int = min([self._last_tweets_count, 100])
+    async def search_tweets(
+        self,
+        phrase: str,
+        since_id: Optional[int] = None,
+        max_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncGenerator[Tuple[List[Tweet], bool], None]:
+        """Scroll back (in past) for `limit` tweets.
+
+        By default `self._last_tweets_count` tweets.
+        Only tweets newer than `since_id` are requested, so each period
+        fetches what was published after the last stored tweet.
+        Scroll starts from `max_id` or from the newest tweet and pages
+        by `max_id` below the oldest tweet of previous page,
+        page rejected with 429 is requested again after limit reset.
+        Pages are parsed by `SearchPage` while body is read and yielded
+        as lists of `Tweet` records with flag of the last page, which is
+        `True` once scroll reached `since_id` (was not cut by `limit`).
+        """
+        if limit is None:
+            limit = self._last_tweets_count
+        count: int = min([limit, 100])
         tweets_count: int = 0
-        params: Union[Dict, None] = {"q": self._query_phrase, "count": count}
-        url: str = self.tweets_url
-        while tweets_count <= self._last_tweets_count:
-            async with self.rate_limit():
-                async with self.session.get(url, params=params) as resp:
-                    json_data = await resp.json()
-                    tweets_count += len(json_data["statuses"])
-                    yield json_data["statuses"]
-
-                    params = None
-                    next_results: str = json_data["search_metadata"].get(
-                        "next_results"
-                    )
-                    if not next_results:
+        params: Dict = {"q": phrase, "count": count}
+        if since_id:
+            params["since_id"] = since_id
+        if max_id:
+            params["max_id"] = max_id
+        while tweets_count <= limit:
+            async with self.rate_limit(phrase):
+                start = time.perf_counter()
+                async with self.session.get(
+                    self.tweets_url, params=params
+                ) as resp:
+                    TWITTER_LATENCY.observe(time.perf_counter() - start)
+                    TWITTER_REQUESTS.inc(1, (str(resp.status),))
+                    self._limiter.update(resp.status, resp.headers)
+                    if resp.status == 429:
+                        continue
+                    resp.raise_for_status()
+                    page = SearchPage()
+                    tweets: List[Tweet] = []
+                    async for chunk in resp.content.iter_any():
+                        tweets.extend(page.feed(chunk))
+                    tweets.extend(page.close())
+                    tweets_count += len(tweets)
+                    last = not tweets or not page.next_results
+                    yield tweets, last
+
+                    if last:
                         break
-                    url = self.tweets_url + next_results
+                    params["max_id"] = min(t.api_id for t in tweets) - 1
 
 
 class AsyncTwitterConsumer(AsyncConsumer, AsyncTwitterAPI):
     """Asynchronous twitter consumer."""
 
+    lock_namespace: int = 1
+
+    def __init__(self, settings: Settings) -> None:
+        """Make consumer with pipeline for writing tweets."""
+        super().__init__(settings)
+        self._pipeline = WritePipeline(
+            Tweets.save,
+            settings.TWITTER_QUEUE_SIZE,
+            settings.TWITTER_BATCH_SIZE,
+            settings.TWITTER_BATCH_TIMEOUT,
+            settings.TWITTER_WRITERS,
+        )
+
     async def run_forever(self, app: Application) -> None:
         """Create new row in query table with query phrase.
 
         Setup twitter session with token, and loop forever.
-        It get last `self._last_tweets_count` tweets queried
-        by specific phrase once in a configured period of time
-        `self._task_period` with rate limits `self.rate_limit`
-        and save tweets into DB.
+        Once in a configured period of time `self._leader_period`
+        it reloads active phrases from `query` table and keeps
+        one `self.consume` task running for each of them.
+        All tasks share one session and one rate limit budget.
+
+        Each phrase is consumed by one process only (gunicorn worker
+        or app instance) - leader holding PG advisory lock on
+        `query.id`. Other processes retry to take the lock each period,
+        so they take over phrase in seconds after leader dies.
         """
+        tasks: Dict[str, asyncio.Task] = {}
+        locks = AdvisoryLocks(app["pg_ingest"], self.lock_namespace)
         try:
             logging.debug("AsyncTwitterConsumer is running now ...")
-            query_id = await Query.save(app["pg"], self._query_phrase)
+            await Query.save(app["pg_ingest"], self._query_phrase)
             await self.create_session()
             while True:
-                async for tweets in self.search_tweets():
-                    if tweets:
-                        await Tweets.save(app["pg"], query_id, tweets)
-                await asyncio.sleep(self._task_period)
+                rows = await Query.get_active(app["pg_ingest"])
+                held = await locks.sync(query["id"] for query in rows)
+                phrases = {q["phrase"]: q for q in rows if q["id"] in held}
+                for phrase in set(tasks) - set(phrases):
+                    tasks.pop(phrase).cancel()
+                    self._scheduler.unregister(phrase)
+                for phrase, query in phrases.items():
+                    self._scheduler.register(phrase, query["priority"])
+                    if phrase not in tasks or tasks[phrase].done():
+                        tasks[phrase] = app.loop.create_task(
+                            self.consume(app, query)
+                        )
+                await sleep(self._leader_period)
         except asyncio.CancelledError as e:
             logging.error(e)
         finally:
-            if self.session:
-                await self.session.close()
+            await asyncio.gather(*(cancel(task) for task in tasks.values()))
+            await locks.close()
+            if self._session is not None:
+                await self._session.close()
             logging.debug("AsyncTwitterConsumer is stoped.")
 
+    async def consume(self, app: Application, query: Any) -> None:
+        """Loop forever over one `query` row.
+
+        It get last `self._last_tweets_count` tweets queried
+        by `query.phrase` once in a configured period of time
+        `self._task_period` with rate limits `self.rate_limit`
+        and put tweets into `self._pipeline` for saving into DB.
+
+        Cached statistic of days with new tweets is dropped
+        in all processes once tweets are written.
+        Newest tweet id is stored as `query.since_id` watermark
+        after scroll reached the old watermark and all it's tweets
+        are saved, so next scroll (or restart) fetches only new tweets.
+        Scroll cut by `self._last_tweets_count` is continued next period
+        below it's oldest tweet, so tweets between it and the watermark
+        are not skipped. Scroll with failed writes starts over.
+        On error task stops and `run_forever` restarts it.
+        """
+        since_id = query["since_id"]
+        # Newest fetched id and upper bound of not finished scroll.
+        newest, max_id = since_id, None
+        try:
+            while True:
+                days: Set[date] = set()
+                reached = False
+                async for tweets, reached in self.search_tweets(
+                    query["phrase"], since_id, max_id
+                ):
+                    if tweets:
+                        TWEETS_FETCHED.inc(len(tweets))
+                        rows = Tweets.rows(query["id"], tweets)
+                        await self._pipeline.put(query["id"], rows)
+                        ids = [t.api_id for t in tweets]
+                        newest = max([newest or 0] + ids)
+                        max_id = min(ids) - 1
+                        days.update(row["published_at"].date() for row in rows)
+                written = await self._pipeline.written(query["id"])
+                if days and "notifications" in app:
+                    await app["notifications"].publish(
+                        "cache", app["cache"].message(query["phrase"], days)
+                    )
+                if not written:
+                    newest, max_id = since_id, None
+                elif reached:
+                    if newest != since_id:
+                        await Query.update_since_id(
+                            app["pg_ingest"], query["id"], newest
+                        )
+                        since_id = newest
+                    max_id = None
+                await sleep(self._task_period)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa pylint: disable=broad-except
+            logging.exception("Consumer for %r failed.", query["phrase"])
+
 
 class AsyncTwitterTasks(AsyncTasks, AsyncTwitterConsumer):
     """Run asynchronous twitter tasks."""
 
     async def startup_bg_tasks(self, app: Application) -> None:
-        """Create new asyncio task with twitter consumer."""
+        """Create new asyncio task with twitter consumer.
+
+        And start writers of it's pipeline, inserted tweets are counted
+        by `app["heavy_hitters"]`.
+        """
+        heavy_hitters = app.get("heavy_hitters")
+        self._pipeline.start(
+            app["pg_ingest"], heavy_hitters and heavy_hitters.saved
+        )
+        app["twitter_pipeline"] = self._pipeline
         app["twitter_session"] = app.loop.create_task(self.run_forever(app))
 
     async def cleanup_bg_tasks(self, app: Application) -> None:
-        """Cancel asyncio task."""
-        app["twitter_session"].cancel()
-        await app["twitter_session"]
+        """Cancel asyncio task, stop scheduler and pipeline."""
+        await cancel(app["twitter_session"])
+        await self._scheduler.stop()
+        await self._pipeline.stop()
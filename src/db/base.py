@@ -1,8 +1,27 @@
 """Base module."""
 
+import time
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
 
-__all__ = ("DB", "AsyncDB")
+from metrics import DB_ACQUIRE_WAIT
+
+__all__ = ("DB", "AsyncDB", "AsyncConnection", "sqlstate")
+
+
+def sqlstate(error: BaseException) -> Optional[str]:
+    """Return SQLSTATE code of driver error."""
+    return getattr(error, "sqlstate", None) or getattr(error, "pgcode", None)
 
 
 class DB(ABC):
@@ -17,8 +36,77 @@ class DB(ABC):
         """DB DSN."""
 
 
+class AsyncConnection(ABC):
+    """Driver neutral connection.
+
+    Queries are SQL text with `:name` params, rows support
+    access by index and by column name.
+    """
+
+    @abstractmethod
+    async def fetch(self, query: str, params: Optional[Dict] = None) -> List:
+        """Return all rows."""
+
+    @abstractmethod
+    async def fetchval(self, query: str, params: Optional[Dict] = None) -> Any:
+        """Return first column of first row."""
+
+    @abstractmethod
+    async def execute(self, query: str, params: Optional[Dict] = None) -> None:
+        """Execute query without rows."""
+
+    @abstractmethod
+    async def copy(self, table: str, rows: List[Dict]) -> None:
+        """Load rows into table by columns of first row."""
+
+    @abstractmethod
+    def cursor(
+        self, query: str, params: Optional[Dict] = None, size: int = 1000
+    ) -> AsyncIterator[List]:
+        """Yield rows by batches of `size` from server side cursor.
+
+        Cursor lives in transaction, next batch is fetched only when
+        previous one is consumed.
+        """
+
+    @abstractmethod
+    def transaction(self) -> AsyncContextManager:
+        """Transaction context manager."""
+
+    @abstractmethod
+    async def listen(self, channel: str) -> None:
+        """Receive `NOTIFY` messages of channel."""
+
+    @abstractmethod
+    async def unlisten(self) -> None:
+        """Stop receiving messages of all channels, drop received ones."""
+
+    @abstractmethod
+    async def notification(self, timeout: float) -> Optional[Tuple[str, str]]:
+        """Return channel and payload of next message.
+
+        Return `None` when no message comes within `timeout` sec.
+        """
+
+
 class AsyncDB(ABC):
-    """Async DB abstract class."""
+    """Async DB abstract class.
+
+    Engine is stored in `app[key]`, models query it by
+    `fetch`, `fetchval` and `execute` or by `acquire`d connection.
+    Reads which may be stale go to engine of `reader`.
+    """
+
+    # Driver errors of lost connection, failed query or acquire timeout.
+    errors: Tuple[Type[BaseException], ...] = ()
+    # App key of engine, it's pool label in metrics.
+    key: str = "pg"
+    # Monotonic time of the last write of process by any engine.
+    last_write: float = float("-inf")
+    # Read replicas `db.replicas.ReplicaSet` of primary engine.
+    replicas: Any = None
+    # Primary engine of replica, reads from it when replica fails.
+    fallback: Optional["AsyncDB"] = None
 
     @abstractmethod
     def create_engine(self):
@@ -31,3 +119,59 @@ class AsyncDB(ABC):
     @abstractmethod
     async def cleanup(self, app):
         """On engine cleanup."""
+
+    @abstractmethod
+    async def connect(self) -> AsyncConnection:
+        """Take connection from pool."""
+
+    @abstractmethod
+    async def release(self, conn: AsyncConnection) -> None:
+        """Return connection into pool."""
+
+    def reader(self) -> "AsyncDB":
+        """Return engine for reads which may be stale, replica or self."""
+        return self.replicas.pick() if self.replicas is not None else self
+
+    @staticmethod
+    def wrote() -> None:
+        """Mark write, so replicas behind it do not serve own reads."""
+        AsyncDB.last_write = time.monotonic()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[AsyncConnection]:
+        """Connection context manager, wait for it is measured."""
+        start = time.perf_counter()
+        conn = await self.connect()
+        DB_ACQUIRE_WAIT.observe(time.perf_counter() - start, (self.key,))
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    async def fetch(self, query: str, params: Optional[Dict] = None) -> List:
+        """Return all rows.
+
+        Replica which failed after health check reads from `fallback`.
+        """
+        try:
+            async with self.acquire() as conn:
+                return await conn.fetch(query, params)
+        except self.errors:
+            if self.fallback is None:
+                raise
+            return await self.fallback.fetch(query, params)
+
+    async def fetchval(self, query: str, params: Optional[Dict] = None) -> Any:
+        """Return first column of first row, see `fetch` for fallback."""
+        try:
+            async with self.acquire() as conn:
+                return await conn.fetchval(query, params)
+        except self.errors:
+            if self.fallback is None:
+                raise
+            return await self.fallback.fetchval(query, params)
+
+    async def execute(self, query: str, params: Optional[Dict] = None) -> None:
+        """Execute query without rows."""
+        async with self.acquire() as conn:
+            await conn.execute(query, params)
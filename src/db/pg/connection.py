@@ -0,0 +1,224 @@
+"""Driver neutral connections of PG engines."""
+
+import asyncio
+import functools
+import itertools
+import json
+import re
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from aiopg.sa.connection import SAConnection
+from asyncpg import Connection
+from sqlalchemy.sql import text
+
+from db.base import AsyncConnection
+
+__all__ = ("AiopgConnection", "AsyncpgConnection", "positional")
+
+# `:name` param, but not `::type` cast.
+PARAM = re.compile(r"(?<![:\w]):(\w+)")
+
+
+@functools.lru_cache(maxsize=1024)
+def positional(query: str) -> Tuple[str, Tuple[str, ...]]:
+    """Convert `:name` params of query into `$n` params.
+
+    Return query and param names in order of their numbers.
+    """
+    names: List[str] = []
+
+    def number(match):
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return "${}".format(names.index(name) + 1)
+
+    return PARAM.sub(number, query), tuple(names)
+
+
+async def get(queue: asyncio.Queue, timeout: float) -> Any:
+    """Return next item of queue, `None` if it's empty for `timeout` sec.
+
+    Unlike `asyncio.wait_for` it never drops cancellation of caller.
+    """
+    getter = asyncio.ensure_future(queue.get())
+    try:
+        await asyncio.wait({getter}, timeout=timeout)
+    finally:
+        if not getter.done():
+            getter.cancel()
+    return getter.result() if getter.done() else None
+
+
+class AiopgConnection(AsyncConnection):
+    """Connection of `aiopg.sa` engine.
+
+    psycopg2 sends queries with params inlined as text,
+    so PG parses and plans each query on every call.
+    """
+
+    # Rows sent as one JSON param by `copy`.
+    copy_chunk_size: int = 10000
+    _cursors = itertools.count()
+
+    def __init__(self, conn: SAConnection) -> None:
+        """Wrap connection."""
+        self.conn = conn
+
+    async def fetch(self, query: str, params: Optional[Dict] = None) -> List:
+        """Return all rows."""
+        result = await self.conn.execute(text(query), params or {})
+        return await result.fetchall()
+
+    async def fetchval(self, query: str, params: Optional[Dict] = None) -> Any:
+        """Return first column of first row."""
+        return await self.conn.scalar(text(query), params or {})
+
+    async def execute(self, query: str, params: Optional[Dict] = None) -> None:
+        """Execute query without rows."""
+        await self.conn.execute(text(query), params or {})
+
+    async def copy(self, table: str, rows: List[Dict]) -> None:
+        """Insert rows by chunks of one JSON param.
+
+        psycopg2 asynchronous mode does not support `COPY`.
+        """
+        if not rows:
+            return
+        columns = ", ".join(rows[0])
+        query = f"""
+            INSERT INTO {table} ({columns}) SELECT {columns}
+                FROM json_populate_recordset(
+                    NULL::{table}, CAST(:rows AS json)
+                )
+            """
+        for start in range(0, len(rows), self.copy_chunk_size):
+            end = start + self.copy_chunk_size
+            chunk = rows[start:end]
+            await self.execute(
+                query, dict(rows=json.dumps(chunk, default=str))
+            )
+
+    async def cursor(
+        self, query: str, params: Optional[Dict] = None, size: int = 1000
+    ) -> AsyncIterator[List]:
+        """Yield rows by batches from cursor made by `DECLARE`.
+
+        psycopg2 asynchronous mode does not support named cursors.
+        Cursor is closed by end of transaction.
+        """
+        name = "cursor_{}".format(next(self._cursors))
+        await self.execute(
+            f"DECLARE {name} NO SCROLL CURSOR FOR {query}", params
+        )
+        while True:
+            rows = await self.fetch(f"FETCH FORWARD {size} FROM {name}")
+            if not rows:
+                break
+            yield rows
+
+    def transaction(self) -> AsyncContextManager:
+        """Transaction context manager."""
+        return self.conn.begin()
+
+    async def listen(self, channel: str) -> None:
+        """Receive messages of channel into `notifies` of connection."""
+        await self.execute(f'LISTEN "{channel}"')
+
+    async def unlisten(self) -> None:
+        """Stop receiving messages, drop received ones."""
+        await self.execute("UNLISTEN *")
+        notifies = self.conn.connection.notifies
+        while not notifies.empty():
+            notifies.get_nowait()
+
+    async def notification(self, timeout: float) -> Optional[Tuple[str, str]]:
+        """Return channel and payload of next message."""
+        notify = await get(self.conn.connection.notifies, timeout)
+        return None if notify is None else (notify.channel, notify.payload)
+
+
+class AsyncpgConnection(AsyncConnection):
+    """Connection of `asyncpg` pool.
+
+    Queries go through binary protocol as prepared statements, which
+    are cached by connection, so PG parses and plans query once.
+    """
+
+    def __init__(self, conn: Connection) -> None:
+        """Wrap connection."""
+        self.conn = conn
+        self._channels: List[str] = []
+        self._notifies: asyncio.Queue = asyncio.Queue()
+
+    async def fetch(self, query: str, params: Optional[Dict] = None) -> List:
+        """Return all rows."""
+        return await self.conn.fetch(*self._args(query, params))
+
+    async def fetchval(self, query: str, params: Optional[Dict] = None) -> Any:
+        """Return first column of first row."""
+        return await self.conn.fetchval(*self._args(query, params))
+
+    async def execute(self, query: str, params: Optional[Dict] = None) -> None:
+        """Execute query without rows."""
+        await self.conn.execute(*self._args(query, params))
+
+    async def copy(self, table: str, rows: List[Dict]) -> None:
+        """Load rows by `COPY` in binary format."""
+        if not rows:
+            return
+        columns = list(rows[0])
+        await self.conn.copy_records_to_table(
+            table,
+            records=[tuple(row[column] for column in columns) for row in rows],
+            columns=columns,
+        )
+
+    async def cursor(
+        self, query: str, params: Optional[Dict] = None, size: int = 1000
+    ) -> AsyncIterator[List]:
+        """Yield rows by batches from cursor portal."""
+        cursor = await self.conn.cursor(*self._args(query, params))
+        while True:
+            rows = await cursor.fetch(size)
+            if not rows:
+                break
+            yield rows
+
+    def transaction(self) -> AsyncContextManager:
+        """Transaction context manager."""
+        return self.conn.transaction()
+
+    async def listen(self, channel: str) -> None:
+        """Receive messages of channel by listener callback."""
+        await self.conn.add_listener(channel, self._notify)
+        self._channels.append(channel)
+
+    async def unlisten(self) -> None:
+        """Remove listener callbacks, drop received messages."""
+        while self._channels:
+            channel = self._channels.pop()
+            await self.conn.remove_listener(channel, self._notify)
+        self._notifies = asyncio.Queue()
+
+    async def notification(self, timeout: float) -> Optional[Tuple[str, str]]:
+        """Return channel and payload of next message."""
+        return await get(self._notifies, timeout)
+
+    def _notify(self, conn: Any, pid: int, channel: str, payload: str):
+        """Queue message received by listener callback."""
+        self._notifies.put_nowait((channel, payload))
+
+    @staticmethod
+    def _args(query: str, params: Optional[Dict]) -> List:
+        """Return positional query and it's params."""
+        query, names = positional(query)
+        return [query] + [(params or {})[name] for name in names]
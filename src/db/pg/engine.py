@@ -1,16 +1,39 @@
 """Engine module."""
 
-from dataclasses import dataclass
-from typing import Any
+import asyncio
+import json
+import time
+import weakref
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Type
 
+import asyncpg
+import psycopg2
 from aiohttp import web
+from aiopg import DEFAULT_TIMEOUT
 from aiopg.sa import create_engine
 from sqlalchemy.engine.url import URL
 
-from db.base import DB, AsyncDB
+from db.base import DB, AsyncConnection, AsyncDB
+from db.pg.connection import AiopgConnection, AsyncpgConnection
+from db.replicas import ReplicaSet
 from web.settings import Settings
 
-__all__ = ("PG", "AsyncPG")
+__all__ = (
+    "PG",
+    "AsyncPG",
+    "AsyncpgPG",
+    "create_pg",
+    "create_ingest_pg",
+    "create_export_pg",
+    "create_replicas",
+)
+
+# Monotonic birth time of `aiopg` pool connections.
+BORN: Any = weakref.WeakKeyDictionary()
+# Ingest pool connections held for process lifetime: advisory locks
+# of twitter and partitions tasks and notifications listener.
+INGEST_PINNED = 3
 
 
 class PG(DB):
@@ -29,7 +52,7 @@ class PG(DB):
 
     @property
     def dsn(self) -> str:
-        """DSN url suitable for sqlalchemy and aiopg."""
+        """DSN url suitable for sqlalchemy, aiopg and asyncpg."""
         return str(
             URL(
                 database=self.settings.DB_NAME,
@@ -41,25 +64,246 @@ class PG(DB):
             )
         )
 
+    def statement_timeout(self, margin: float = 0) -> str:
+        """PG `statement_timeout` in ms with `margin` sec, `0` is no limit."""
+        timeout = self.settings.DB_STATEMENT_TIMEOUT
+        return str(int((timeout + margin) * 1000)) if timeout else "0"
+
+    def expired(self, born: float) -> bool:
+        """Check connection born at `born` outlived max lifetime."""
+        lifetime = self.settings.DB_POOL_MAX_LIFETIME
+        return bool(lifetime) and time.monotonic() - born > lifetime
+
+
+class AgedConnection(asyncpg.Connection):
+    """Asyncpg connection which knows it's birth time."""
+
+    __slots__ = ("born",)
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Make connection born now."""
+        super().__init__(*args, **kwargs)
+        self.born = time.monotonic()
+
 
 @dataclass
 class AsyncPG(AsyncDB, PG):
-    """Aiopg PostgreSQL driver for aiohttp application."""
+    """Aiopg PostgreSQL driver for aiohttp application.
+
+    Pool holds `DB_POOL_MIN_SIZE` to `DB_POOL_MAX_SIZE` connections,
+    the min ones are opened by `startup`, so first requests do not
+    wait for connecting.
+    aiopg raises statement canceled by PG as cancelled task, so query
+    is limited by it's client timeout, which closes connection, and
+    PG stops abandoned query a second later. Without statement
+    timeout aiopg keeps it's default client timeout.
+    """
+
+    __slots__ = ("settings", "loop")
+
+    settings: Settings
+    loop: Any
+    key: str = "pg"
+
+    errors = (psycopg2.Error, OSError, asyncio.TimeoutError)
+
+    def create_engine(self):
+        """Create new aiopg engine with min connections opened."""
+        return create_engine(
+            self.dsn,
+            loop=self.loop,
+            minsize=self.settings.DB_POOL_MIN_SIZE,
+            maxsize=self.settings.DB_POOL_MAX_SIZE,
+            on_connect=self.init_connection,
+            timeout=self.settings.DB_STATEMENT_TIMEOUT or DEFAULT_TIMEOUT,
+            options=f"-c statement_timeout={self.statement_timeout(1)}",
+        )
+
+    @staticmethod
+    async def init_connection(conn: Any) -> None:
+        """Remember birth time of connection."""
+        BORN[conn] = time.monotonic()
+
+    async def startup(self, app: web.Application) -> None:
+        """Add engine and it's replicas on application startup."""
+        self.engine = await self.create_engine()
+        self.replicas = create_replicas(self, self.settings, self.loop)
+        app[self.key] = self
+
+    async def cleanup(self, app: web.Application) -> None:
+        """Drop aiopg engine and replicas on application cleanup."""
+        if self.replicas is not None:
+            await self.replicas.stop()
+        self.engine.close()
+        await self.engine.wait_closed()
+
+    async def connect(self) -> AsyncConnection:
+        """Take connection from pool, wait up to `DB_ACQUIRE_TIMEOUT`."""
+        return AiopgConnection(
+            await asyncio.wait_for(
+                self.engine.acquire(),
+                self.settings.DB_ACQUIRE_TIMEOUT or None,
+            )
+        )
+
+    async def release(self, conn: AsyncConnection) -> None:
+        """Return connection into pool, close it if it's expired."""
+        assert isinstance(conn, AiopgConnection)
+        raw = conn.conn.connection
+        if self.expired(BORN.get(raw, time.monotonic())):
+            await raw.close()
+        await conn.conn.close()
+
+
+@dataclass
+class AsyncpgPG(AsyncDB, PG):
+    """Asyncpg PostgreSQL driver for aiohttp application.
+
+    Each connection keeps up to `DB_STATEMENT_CACHE_SIZE`
+    prepared statements. Pool is sized as `AsyncPG` one.
+    """
 
     __slots__ = ("settings", "loop")
 
     settings: Settings
     loop: Any
+    key: str = "pg"
+
+    errors = (
+        asyncpg.PostgresError,
+        asyncpg.InterfaceError,
+        OSError,
+        asyncio.TimeoutError,
+    )
 
     def create_engine(self):
-        """Create new aiopg engine."""
-        return create_engine(self.dsn, loop=self.loop)
+        """Create new asyncpg pool with min connections opened."""
+        return asyncpg.create_pool(
+            self.dsn,
+            min_size=self.settings.DB_POOL_MIN_SIZE,
+            max_size=self.settings.DB_POOL_MAX_SIZE,
+            statement_cache_size=self.settings.DB_STATEMENT_CACHE_SIZE,
+            server_settings={"statement_timeout": self.statement_timeout()},
+            connection_class=AgedConnection,
+            init=self.init_connection,
+        )
+
+    @staticmethod
+    async def init_connection(conn: asyncpg.Connection) -> None:
+        """Decode JSON into python objects like psycopg2 does.
+
+        JSON params are passed as text by models.
+        """
+        for name in ("json", "jsonb"):
+            await conn.set_type_codec(
+                name, encoder=str, decoder=json.loads, schema="pg_catalog"
+            )
 
     async def startup(self, app: web.Application) -> None:
-        """Add aiopg engine on application startup."""
-        app["pg"] = await self.create_engine()
+        """Add engine and it's replicas on application startup."""
+        self.engine = await self.create_engine()
+        self.replicas = create_replicas(self, self.settings, self.loop)
+        app[self.key] = self
 
     async def cleanup(self, app: web.Application) -> None:
-        """Drop aiopg engine on application cleanup."""
-        app["pg"].close()
-        await app["pg"].wait_closed()
+        """Close asyncpg pool and replicas on application cleanup."""
+        if self.replicas is not None:
+            await self.replicas.stop()
+        await self.engine.close()
+
+    async def connect(self) -> AsyncConnection:
+        """Take connection from pool, wait up to `DB_ACQUIRE_TIMEOUT`."""
+        return AsyncpgConnection(
+            await self.engine.acquire(
+                timeout=self.settings.DB_ACQUIRE_TIMEOUT or None
+            )
+        )
+
+    async def release(self, conn: AsyncConnection) -> None:
+        """Return connection into pool, close it if it's expired."""
+        assert isinstance(conn, AsyncpgConnection)
+        if self.expired(conn.conn.born):
+            await conn.conn.close()
+        await self.engine.release(conn.conn)
+
+
+ENGINES: Dict[str, Type[AsyncDB]] = {"aiopg": AsyncPG, "asyncpg": AsyncpgPG}
+
+
+def create_pg(settings: Settings, loop: Any, key: str = "pg") -> AsyncDB:
+    """Make engine of `settings.DB_ENGINE` driver stored in `app[key]`."""
+    if settings.DB_ENGINE not in ENGINES:
+        raise ValueError("Incorrect engine!")
+    return ENGINES[settings.DB_ENGINE](settings, loop, key)  # type: ignore
+
+
+def create_ingest_pg(settings: Settings, loop: Any) -> AsyncDB:
+    """Make engine of background tasks stored in `app["pg_ingest"]`.
+
+    It has own pool of `DB_INGEST_POOL_*` size, so ingest and API
+    do not wait for connections of each other. Pool has
+    `INGEST_PINNED` connections more for locks and notifications,
+    so queries and writers always have `DB_INGEST_POOL_MAX_SIZE`.
+    Bulk merges are limited by `DB_INGEST_STATEMENT_TIMEOUT`, not
+    by API one. It has no replicas.
+    """
+    ingest = replace(
+        settings,
+        DB_POOL_MIN_SIZE=settings.DB_INGEST_POOL_MIN_SIZE + INGEST_PINNED,
+        DB_POOL_MAX_SIZE=settings.DB_INGEST_POOL_MAX_SIZE + INGEST_PINNED,
+        DB_STATEMENT_TIMEOUT=settings.DB_INGEST_STATEMENT_TIMEOUT,
+        DB_REPLICA_HOSTS="",
+    )
+    return create_pg(ingest, loop, "pg_ingest")
+
+
+def create_export_pg(settings: Settings, loop: Any) -> AsyncDB:
+    """Make engine of exports stored in `app["pg_export"]`.
+
+    Export holds connection while client reads it, so exports have
+    own pool of `DB_EXPORT_POOL_SIZE` opened on demand.
+    """
+    export = replace(
+        settings,
+        DB_POOL_MIN_SIZE=0,
+        DB_POOL_MAX_SIZE=settings.DB_EXPORT_POOL_SIZE,
+        DB_REPLICA_HOSTS="",
+    )
+    return create_pg(export, loop, "pg_export")
+
+
+def create_replicas(
+    pg: AsyncDB, settings: Settings, loop: Any
+) -> Optional[ReplicaSet]:
+    """Start replicas of `settings.DB_REPLICA_HOSTS` for primary `pg`.
+
+    Replica engines are of the same driver, hosts without port
+    listen on `settings.DB_PORT`. Return `None` without replicas.
+    """
+    hosts = [h.strip() for h in settings.DB_REPLICA_HOSTS.split(",")]
+    engines = {}
+    for host in filter(None, hosts):
+        name, _, port = host.partition(":")
+        replica = type(pg)(  # type: ignore
+            replace(
+                settings,
+                DB_HOST=name,
+                DB_PORT=int(port or settings.DB_PORT),
+                DB_REPLICA_HOSTS="",
+            ),
+            loop,
+            "pg_replica",
+        )
+        replica.fallback = pg
+        engines[host] = replica
+    if not engines:
+        return None
+    replicas = ReplicaSet(
+        pg,
+        engines,
+        settings.DB_REPLICA_CHECK_PERIOD,
+        settings.DB_REPLICA_MAX_LAG,
+        bool(settings.DB_REPLICA_READ_YOUR_WRITES),
+    )
+    replicas.start(loop)
+    return replicas
@@ -0,0 +1,73 @@
+"""PG advisory locks module."""
+
+import logging
+from typing import Iterable, Optional, Set
+
+from db.base import AsyncConnection, AsyncDB
+
+__all__ = ("AdvisoryLocks",)
+
+
+class AdvisoryLocks:
+    """Session level advisory locks held on one dedicated connection.
+
+    Lock is bound to connection, so when process (or connection) dies
+    PG releases it and other process can take it on next `sync`.
+    Keys are `(namespace, key)` pairs of `pg_try_advisory_lock`.
+    """
+
+    def __init__(self, pg: AsyncDB, namespace: int) -> None:
+        """Make locks without connection, it is acquired lazily."""
+        self._pg = pg
+        self._namespace = namespace
+        self._conn: Optional[AsyncConnection] = None
+        self._held: Set[int] = set()
+
+    @property
+    def held(self) -> Set[int]:
+        """Keys held by this process."""
+        return set(self._held)
+
+    async def sync(self, keys: Iterable[int]) -> Set[int]:
+        """Try to take all `keys` and release held keys not in `keys`.
+
+        Return keys held now. When connection is lost all locks are
+        lost with it, so return empty set and reconnect on next call.
+        """
+        keys = set(keys)
+        try:
+            if self._conn is None:
+                self._conn = await self._pg.connect()
+            for key in self._held - keys:
+                await self._call("pg_advisory_unlock", key)
+                self._held.discard(key)
+            for key in keys - self._held:
+                if await self._call("pg_try_advisory_lock", key):
+                    self._held.add(key)
+            # Check connection even if nothing has changed.
+            await self._conn.fetchval("SELECT 1")
+        except self._pg.errors as e:
+            logging.error("Advisory locks are lost: %s", e)
+            await self.close()
+        return self.held
+
+    async def close(self) -> None:
+        """Release all locks and return connection into pool."""
+        self._held.clear()
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            await conn.fetchval("SELECT pg_advisory_unlock_all()")
+        except self._pg.errors:
+            pass
+        finally:
+            await self._pg.release(conn)
+
+    async def _call(self, func: str, key: int) -> bool:
+        """Call advisory lock function for `key`."""
+        assert self._conn
+        return await self._conn.fetchval(
+            f"SELECT {func}(:namespace, :key)",
+            dict(namespace=self._namespace, key=key),
+        )
@@ -1,40 +1,62 @@
-"""Models module."""
+"""Models module.
 
-from typing import Any, Dict, List, Union
+Queries are SQL text with `:name` params run by driver neutral
+`AsyncDB` engine, see `db/base.py`. API reads go to `pg.reader()`,
+replica if replicas are configured, see `db/replicas.py`.
+"""
+
+import json
+import time
+from datetime import date, datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
 import sqlalchemy as sa
-from aiopg.sa.engine import Engine
-from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.sql import text
-from sqlalchemy.sql.selectable import Select
 
-__all__ = ("Query", "Tweets")
+from db.base import AsyncDB, sqlstate
+from db.singleflight import single_flight
+from metrics import TWEETS_DUPLICATES, TWEETS_INSERTED, TWEETS_SAVE_LATENCY
+
+__all__ = ("Query", "Tweets", "Backfill", "Partitions", "Statistic")
 
+CHECK_VIOLATION = "23514"
 
 SABase: Any = declarative_base()
 
 
+def iso_date(value: str) -> date:
+    """Convert ISO date param into date."""
+    return datetime.fromisoformat(value).date()
+
+
 class Base(SABase):
     """Abstract `sqlalchemy` class for models."""
 
     __abstract__ = True
 
-    @classmethod
-    def upsert(cls, values: Union[Dict, List[Dict]]) -> postgresql.dml.Insert:
-        """Generate SQL upsert with `do nothing` for model `cls.__table__`."""
-        return (
-            postgresql.insert(cls.__table__)
-            .values(values)
-            .on_conflict_do_nothing()
-        )
-
 
 class Query(Base):
     """Query table for storing query phrase.
 
     Sharing it with other tables by `id` field.
     Index field `phrase` for read performance.
+    Consumer ingests all `active` phrases, new phrase is
+    added by inserting row, `priority` weights it's share
+    of API requests.
+    Phrase is unique ignoring register. Rows are never deleted,
+    so phrase registry `_ids` maps lowercase phrases to their `id`
+    for reading by `query_id`. Registry is reloaded for unknown
+    phrase at most once in `reload_period` sec, so requests of
+    phrases which are not stored do not query DB each time.
     """
 
     __tablename__ = "query"
@@ -44,33 +66,87 @@ class Query(Base):
     )
     published_at = sa.Column(sa.Date, nullable=False)
     phrase = sa.Column(sa.Text, nullable=False)
+    since_id = sa.Column(sa.BigInteger)
+    priority = sa.Column(sa.Integer, nullable=False, default=1)
+    active = sa.Column(sa.Boolean, nullable=False, default=True)
 
-    @classmethod
-    def get_by_phrasee(cls, phrase: str) -> Select:
-        """Generate SQL for getting `Query` row by phrase, ignore register."""
-        return cls.__table__.select().where(
-            sa.func.lower(cls.__table__.c.phrase) == sa.func.lower(phrase)
-        )
+    reload_period: float = 5
+    _ids: Dict[str, int] = {}
+    # Monotonic time of the last registry load.
+    _loaded: float = float("-inf")
 
     @classmethod
-    async def save(cls, pg: Engine, query: str) -> int:
+    async def save(cls, pg: AsyncDB, query: str) -> int:
         """Upsert by unique `phrase` row into table `query`.
 
-        Return it's `id`. Upsert `on_conflict_do_nothing`
-        do not return `id`, so we need fetch it.
+        Return it's `id` in one round trip. Upsert with
+        `on_conflict_do_nothing` does not return `id` of existing row,
+        no-op update returns it, even if concurrent worker has just
+        inserted the same phrase. Phrase different by register only
+        returns existing row.
         """
-        async with pg.acquire() as conn:
-            async for row in conn.execute(cls.upsert({"phrase": query})):
-                if row:
-                    return row[0]
-            async for row in conn.execute(cls.get_by_phrasee(query)):
-                return row[0]
-        assert row
-        return row[0]
+        sql = """
+            INSERT INTO query (phrase) VALUES (:phrase)
+                ON CONFLICT (lower(phrase))
+                DO UPDATE SET phrase = query.phrase
+                RETURNING id
+            """
+        query_id = await pg.fetchval(sql, dict(phrase=query))
+        cls._ids.setdefault(query.lower(), query_id)
+        return query_id
+
+    @classmethod
+    @single_flight
+    async def load_ids(cls, pg: AsyncDB) -> None:
+        """Load phrase registry, phrase ignores register."""
+        query = "SELECT lower(phrase), id FROM query"
+        cls._loaded = time.monotonic()
+        cls._ids = {row[0]: row[1] for row in await pg.fetch(query)}
+
+    @classmethod
+    async def get_id(cls, pg: AsyncDB, phrase: str) -> Optional[int]:
+        """Return `id` of phrase, `None` if it's not stored."""
+        return (await cls.get_ids(pg, [phrase]))[0]
+
+    @classmethod
+    async def get_ids(
+        cls, pg: AsyncDB, phrases: Iterable[str]
+    ) -> List[Optional[int]]:
+        """Return `id` of each phrase, reload registry once if needed."""
+        phrases = [phrase.lower() for phrase in phrases]
+        if any(phrase not in cls._ids for phrase in phrases) and (
+            time.monotonic() - cls._loaded >= cls.reload_period
+        ):
+            await cls.load_ids(pg)
+        return [cls._ids.get(phrase) for phrase in phrases]
+
+    @classmethod
+    async def get_active(cls, pg: AsyncDB) -> List[Any]:
+        """Return all active `query` rows, phrases for consuming."""
+        return await pg.fetch("SELECT * FROM query WHERE active")
+
+    @classmethod
+    async def update_since_id(
+        cls, pg: AsyncDB, query_id: int, since_id: int
+    ) -> None:
+        """Move watermark forward, never back.
+
+        Watermark is stored only after tweets were saved, so on restart
+        consumer resumes from the last fully processed scroll.
+        """
+        query = """
+            UPDATE query
+                SET since_id = greatest(coalesce(since_id, 0), :since_id)
+                WHERE id = :query_id
+            """
+        await pg.execute(query, dict(query_id=query_id, since_id=since_id))
 
 
 class Tweets(Base):
-    """Tweets table for storing all incoming unique tweets."""
+    """Tweets table for storing all incoming unique tweets.
+
+    Table is partitioned by month of `published_at`, see `Partitions`.
+    """
 
     __tablename__ = "tweets"
 
@@ -78,156 +154,578 @@ class Tweets(Base):
         sa.BigInteger, primary_key=True, nullable=False, autoincrement=True
     )
     api_id = sa.Column(sa.Text, nullable=False)
-    published_at = sa.Column(sa.DateTime, nullable=False)
+    published_at = sa.Column(sa.DateTime, primary_key=True, nullable=False)
     phrase = sa.Column(sa.Text, nullable=False)
     hashtags = sa.Column(sa.ARRAY(sa.Text))
     author_id = sa.Column(sa.BigInteger, nullable=False)
     query_id = sa.Column(sa.BigInteger, nullable=False)
 
+    # Rows count from which `save` goes through `bulk_save`.
+    bulk_threshold: int = 1000
+    # Rows fetched from cursor at once by `export`.
+    export_batch_size: int = 1000
+
+    @classmethod
+    def rows(cls, query_id: int, tweets: Iterable[Any]) -> List[Dict]:
+        """Make table rows of `query_id` from API tweet records.
+
+        Records are `bg_tasks.search.Tweet` with UTC `created_at`
+        already parsed into naive datetime.
+        """
+        return [
+            {
+                "api_id": str(tweet.api_id),
+                "published_at": tweet.created_at,
+                "phrase": tweet.text,
+                "hashtags": list(tweet.hashtags) or None,
+                "author_id": tweet.author_id,
+                "query_id": query_id,
+            }
+            for tweet in tweets
+        ]
+
     @classmethod
-    async def save(cls, pg: Engine, query_id: int, tweets: List[Dict]) -> None:
+    async def save(cls, pg: AsyncDB, rows: List[Dict]) -> List[Dict]:
         """On save tweet call SQL `tweets_trigger`.
 
         And upsert `hashtags` and `authors` tables rows.
         More info in `sql/init.sql` file.
+        Rows are sent as one JSON param, big amount of rows
+        is saved by `bulk_save`.
+        Partitions for days of rows are created if they are absent.
+        Return inserted rows, others were already stored.
+        """
+        start = time.perf_counter()
+        await Partitions.ensure(
+            pg, {row["published_at"].date() for row in rows}
+        )
+        query = """
+            WITH inserted AS (
+                INSERT INTO tweets (
+                    api_id, published_at, phrase,
+                    hashtags, author_id, query_id
+                )
+                SELECT api_id, published_at, phrase,
+                    hashtags, author_id, query_id
+                    FROM json_populate_recordset(
+                        NULL::tweets, CAST(:rows AS json)
+                    )
+                ON CONFLICT DO NOTHING
+                RETURNING api_id
+            )
+            SELECT coalesce(array_agg(api_id), '{}') FROM inserted
+            """
+        try:
+            if len(rows) >= cls.bulk_threshold:
+                inserted = await cls.bulk_save(pg, rows)
+            else:
+                inserted = await pg.fetchval(
+                    query, dict(rows=json.dumps(rows, default=str))
+                )
+        except pg.errors as e:
+            if sqlstate(e) == CHECK_VIOLATION:
+                # Partition was dropped by other process, check them again.
+                Partitions.forget()
+            raise
+        pg.wrote()
+        # Tweet found by several phrases is inserted once.
+        ids = set(inserted)
+        saved = []
+        for row in rows:
+            if row["api_id"] in ids:
+                ids.discard(row["api_id"])
+                saved.append(row)
+        TWEETS_SAVE_LATENCY.observe(time.perf_counter() - start)
+        TWEETS_INSERTED.inc(len(saved))
+        TWEETS_DUPLICATES.inc(len(rows) - len(saved))
+        return saved
+
+    @classmethod
+    async def bulk_save(cls, pg: AsyncDB, rows: List[Dict]) -> List[str]:
+        """Load rows into temporary (not logged) staging table and merge.
+
+        Rows are loaded by `COPY` or by chunks of one JSON param
+        if driver does not support it, so SQL size and params count
+        do not grow with rows count. Merge is one statement, so
+        `tweets_trigger` updates `hashtags` and `authors` once
+        for all rows. Return `api_id` of inserted rows.
         """
-        rows = []
-        for tweet in tweets:
-            hashtags = [tag["text"] for tag in tweet["entities"]["hashtags"]]
-            row = {
-                "api_id": tweet["id"],
-                "published_at": tweet["created_at"],
-                "phrase": tweet["text"],
-                "hashtags": hashtags or None,
-                "author_id": tweet["user"]["id"],
-                "query_id": query_id,
-            }
-            rows.append(row)
         async with pg.acquire() as conn:
-            await conn.execute(cls.upsert(rows))
+            async with conn.transaction():
+                await conn.execute(
+                    """
+                    CREATE TEMP TABLE tweets_load (
+                        api_id text,
+                        published_at timestamp,
+                        phrase text,
+                        hashtags text[],
+                        author_id bigint,
+                        query_id bigint
+                    ) ON COMMIT DROP
+                    """
+                )
+                await conn.copy("tweets_load", rows)
+                return await conn.fetchval(
+                    """
+                    WITH inserted AS (
+                        INSERT INTO tweets (
+                            api_id, published_at, phrase,
+                            hashtags, author_id, query_id
+                        )
+                        SELECT api_id, published_at, phrase,
+                            hashtags, author_id, query_id
+                            FROM tweets_load
+                        ON CONFLICT DO NOTHING
+                        RETURNING api_id
+                    )
+                    SELECT coalesce(array_agg(api_id), '{}') FROM inserted
+                    """
+                )
 
     @classmethod
+    @single_flight
     async def unique_tweets(
-        cls, pg: Engine, phrase: str, count: int, offset: int = 0
-    ):
-        """Return unique tweets by phrase with limit/offset."""
-        rows = []
+        cls, pg: AsyncDB, query_id: Optional[int], count: int, offset: int = 0
+    ) -> str:
+        """Return JSON array of unique tweets of `query_id` with limit/offset.
+
+        Partitions are read in `published_at` order from index
+        and scan stops at limit. JSON text is made by PG.
+        """
         count = min([count, 100])
-        query = text(
-            """
-            SELECT to_jsonb(t) FROM tweets t JOIN query q ON t.query_id = q.id
-                WHERE lower(q.phrase) = lower(:phrase)
-                ORDER BY t.published_at desc LIMIT :count OFFSET :offset
+        query = """
+            SELECT coalesce(
+                json_agg(p.data ORDER BY p.published_at DESC), '[]'
+            )::text FROM (
+                SELECT to_jsonb(t) AS data, t.published_at FROM tweets t
+                    WHERE t.query_id = :query_id
+                    ORDER BY t.published_at DESC LIMIT :count OFFSET :offset
+            ) p
             """
+        return await pg.reader().fetchval(
+            query, dict(query_id=query_id, count=count, offset=offset)
         )
-        async with pg.acquire() as conn:
-            async for row in conn.execute(
-                query, dict(phrase=phrase, count=count, offset=offset)
-            ):
-                rows.append(row[0])
-        return rows
 
     @classmethod
+    @single_flight
+    async def tweets_after(
+        cls,
+        pg: AsyncDB,
+        query_id: Optional[int],
+        count: int,
+        published_at: Optional[str] = None,
+        tweet_id: Optional[int] = None,
+    ) -> Tuple[str, Optional[Tuple[datetime, int]]]:
+        """Return unique tweets of `query_id` older than `(published_at, id)`.
+
+        Keyset pagination over index `idx_tweets_query_published`,
+        each page costs the same no matter how deep it is.
+        Without `published_at` return first page.
+        Return JSON array made by PG and `(published_at, id)`
+        of the last tweet of full page or `None` on the last page.
+        """
+        count = min([count, 100])
+        after = (
+            "AND (t.published_at, t.id) < (:published_at, :tweet_id)"
+            if published_at
+            else ""
+        )
+        query = f"""
+            SELECT coalesce(
+                    json_agg(
+                        to_jsonb(p) ORDER BY p.published_at DESC, p.id DESC
+                    ), '[]'
+                )::text AS tweets,
+                count(*) AS count,
+                (array_agg(p.published_at ORDER BY p.published_at, p.id))[1]
+                    AS published_at,
+                (array_agg(p.id ORDER BY p.published_at, p.id))[1] AS id
+            FROM (
+                SELECT * FROM tweets t
+                    WHERE t.query_id = :query_id {after}
+                    ORDER BY t.published_at DESC, t.id DESC LIMIT :count
+            ) p
+            """
+        params: Dict[str, Any] = dict(query_id=query_id, count=count)
+        if published_at:
+            params.update(
+                published_at=datetime.fromisoformat(published_at),
+                tweet_id=tweet_id,
+            )
+        rows = await pg.reader().fetch(query, params)
+        last = None
+        if rows[0]["count"] == count:
+            last = (rows[0]["published_at"], rows[0]["id"])
+        return rows[0]["tweets"], last
+
+    @classmethod
+    async def recent(cls, pg: AsyncDB, since: datetime) -> List[Any]:
+        """Return statistic fields of rows published since `since`."""
+        query = """
+            SELECT t.published_at, t.hashtags, t.author_id, t.query_id
+                FROM tweets t
+                WHERE t.published_at >= :since
+            """
+        return await pg.fetch(query, dict(since=since))
+
+    @classmethod
+    @single_flight
     async def count_tweets(
-        cls, pg: Engine, phrase: str, from_date: str, to_date: str
+        cls, pg: AsyncDB, query_id: Optional[int], from_date: str, to_date: str
     ):
-        """Count of tweets for given phrase and from_date/to_date."""
-        rows = []
-        query = text(
+        """Count of tweets for given `query_id` and from_date/to_date.
+
+        Sum `tweets_daily` counters of days before `to_date`,
+        tweets of `to_date` day are counted only at it's midnight
+        (`published_at <= date(:to_date)`), took them from index.
+        Return JSON array made by PG.
+        """
+        query = """
+            SELECT json_build_array(json_build_object('counter', (
+                coalesce((
+                    SELECT sum(d.counter)
+                    FROM tweets_daily d
+                    WHERE d.query_id = :query_id
+                        AND d.published_at >= CAST(:from_date AS date)
+                        AND d.published_at < CAST(:to_date AS date)
+                ), 0) + (
+                    SELECT count(t.id)
+                    FROM tweets t
+                    WHERE t.query_id = :query_id
+                        AND t.published_at = CAST(:to_date AS date)
+                        AND CAST(:to_date AS date) >= CAST(:from_date AS date)
+                )
+            )::bigint))::text as data
             """
-            SELECT json_build_object('counter', count(t.id)) as data
-                FROM tweets t JOIN query q ON t.query_id = q.id
-                WHERE lower(q.phrase) = lower(:phrase)
-                    AND t.published_at >= date(:from_date)
-                    AND t.published_at <= date(:to_date)
+        params = dict(
+            query_id=query_id,
+            from_date=iso_date(from_date),
+            to_date=iso_date(to_date),
+        )
+        return await pg.reader().fetchval(query, params)
+
+    @classmethod
+    async def export(
+        cls, pg: AsyncDB, query_id: Optional[int], from_date: str, to_date: str
+    ) -> AsyncIterator[List[str]]:
+        """Yield JSON lines of tweets of `query_id` by batches.
+
+        Tweets published from `from_date` to the end of `to_date` day,
+        ordered by publication. Rows are read by server side cursor,
+        so only one batch of `cls.export_batch_size` rows is in memory
+        and the next one is fetched when previous is consumed.
+        JSON is rendered by PG and passed as is.
+        """
+        query = """
+            SELECT to_jsonb(t)::text FROM tweets t
+                WHERE t.query_id = :query_id
+                    AND t.published_at >= CAST(:from_date AS date)
+                    AND t.published_at < CAST(:to_date AS date) + 1
+                ORDER BY t.published_at, t.id
             """
+        params = dict(
+            query_id=query_id,
+            from_date=iso_date(from_date),
+            to_date=iso_date(to_date),
         )
         async with pg.acquire() as conn:
-            async for row in conn.execute(
-                query,
-                dict(phrase=phrase, from_date=from_date, to_date=to_date),
-            ):
-                rows.append(row[0])
-        return rows
+            async with conn.transaction():
+                batches = conn.cursor(query, params, cls.export_batch_size)
+                async for rows in batches:
+                    yield [row[0] + "\n" for row in rows]
+
+
+class Backfill:
+    """Checkpoints of historical backfill by time windows of phrase.
+
+    Window row keeps `max_id` of it's next page and count of fetched
+    tweets, so interrupted backfill resumes from the last saved page.
+    """
+
+    @classmethod
+    async def plan(
+        cls,
+        pg: AsyncDB,
+        query_id: int,
+        windows: List[Tuple[datetime, datetime]],
+    ) -> List[Any]:
+        """Add absent `windows` of `query_id`, return not done ones.
+
+        Windows are returned newest first with their checkpoints.
+        """
+        query = """
+            INSERT INTO backfill (query_id, window_start, window_end)
+                SELECT :query_id, w.window_start, w.window_end
+                    FROM unnest(
+                        CAST(:starts AS timestamp[]),
+                        CAST(:ends AS timestamp[])
+                    ) w(window_start, window_end)
+                ON CONFLICT DO NOTHING
+            """
+        params = dict(
+            query_id=query_id,
+            starts=[start for start, _ in windows],
+            ends=[end for _, end in windows],
+        )
+        await pg.execute(query, params)
+        query = """
+            SELECT b.window_start, b.window_end, b.max_id, b.fetched
+                FROM backfill b
+                    JOIN unnest(
+                        CAST(:starts AS timestamp[]),
+                        CAST(:ends AS timestamp[])
+                    ) w(window_start, window_end)
+                    USING (window_start, window_end)
+                WHERE b.query_id = :query_id AND NOT b.done
+                ORDER BY b.window_start DESC
+            """
+        return await pg.fetch(query, params)
+
+    @classmethod
+    async def checkpoint(
+        cls,
+        pg: AsyncDB,
+        query_id: int,
+        window: Tuple[datetime, datetime],
+        max_id: Optional[int],
+        fetched: int,
+        done: bool = False,
+    ) -> None:
+        """Store next page `max_id` of window after it's rows are saved."""
+        query = """
+            UPDATE backfill
+                SET max_id = :max_id, fetched = :fetched, done = :done,
+                    updated_at = NOW()
+                WHERE query_id = :query_id
+                    AND window_start = :window_start
+                    AND window_end = :window_end
+            """
+        params = dict(
+            query_id=query_id,
+            window_start=window[0],
+            window_end=window[1],
+            max_id=max_id,
+            fetched=fetched,
+            done=done,
+        )
+        await pg.execute(query, params)
+
+
+class Partitions:
+    """Monthly partitions of tweets and statistic tables.
+
+    Months with existing partitions are remembered, so `ensure`
+    goes to DB only for new months. Counters of `rollups` are rows
+    per day or hour, they are not partitioned and expire by delete.
+    """
+
+    tables = ("tweets", "hashtags", "authors")
+    rollups = ("tweets_daily", "tweets_hourly")
+    _known: Set[date] = set()
+
+    @classmethod
+    async def ensure(cls, pg: AsyncDB, days: Iterable[date]) -> None:
+        """Create partitions of all tables for `days` if they are absent."""
+        missing = {day.replace(day=1) for day in days} - cls._known
+        if not missing:
+            return
+        query = """
+            SELECT create_partitions(t, d)
+                FROM unnest(CAST(:tables AS text[])) t,
+                    unnest(CAST(:days AS date[])) d
+            """
+        await pg.execute(
+            query, dict(tables=list(cls.tables), days=sorted(missing))
+        )
+        cls._known.update(missing)
+
+    @classmethod
+    async def drop_before(cls, pg: AsyncDB, day: date) -> int:
+        """Drop partitions of all tables and rollups of months before `day`.
+
+        Month of `day` is kept whole, so statistic of it's days stays
+        consistent. Return count of dropped partitions.
+        """
+        day = day.replace(day=1)
+        query = """
+            SELECT coalesce(sum(drop_partitions(t, :day)), 0)
+                FROM unnest(CAST(:tables AS text[])) t
+            """
+        dropped = await pg.fetchval(
+            query, dict(tables=list(cls.tables), day=day)
+        )
+        for table in cls.rollups:
+            await pg.execute(
+                f"DELETE FROM {table} WHERE published_at < :day", dict(day=day)
+            )
+        cls._known = {known for known in cls._known if known >= day}
+        return dropped
+
+    @classmethod
+    def forget(cls) -> None:
+        """Forget known partitions."""
+        cls._known = set()
 
 
 class Hashtags:
     """Query for hashtags table."""
 
     @classmethod
+    @single_flight
     async def top(
         cls,
-        pg: Engine,
-        phrase: str,
+        pg: AsyncDB,
+        query_id: Optional[int],
         from_date: str,
         to_date: str,
         top_count: int = 3,
     ):
-        """Top Hashtags."""
-        rows = []
-        query = text(
-            """
-            SELECT json_build_object('tag', h.tag, 'counter', sum(h.counter))
-             as data FROM hashtags h JOIN query q ON h.query_id = q.id
-                WHERE lower(q.phrase) = lower(:phrase)
-                    AND h.published_at >= date(:from_date)
-                    AND h.published_at <= date(:to_date)
-                GROUP BY h.tag
-                ORDER BY sum(h.counter) DESC
-                LIMIT :top_count
+        """Top Hashtags as JSON array made by PG."""
+        query = """
+            SELECT coalesce(json_agg(
+                json_build_object('tag', h.tag, 'counter', h.counter)
+                ORDER BY h.counter DESC
+            ), '[]')::text as data FROM (
+                SELECT h.tag, sum(h.counter) AS counter
+                    FROM hashtags h
+                    WHERE h.query_id = :query_id
+                        AND h.published_at >= CAST(:from_date AS date)
+                        AND h.published_at <= CAST(:to_date AS date)
+                    GROUP BY h.tag
+                    ORDER BY sum(h.counter) DESC
+                    LIMIT :top_count
+            ) h
             """
+        params = dict(
+            query_id=query_id,
+            from_date=iso_date(from_date),
+            to_date=iso_date(to_date),
+            top_count=top_count,
         )
-        async with pg.acquire() as conn:
-            async for row in conn.execute(
-                query,
-                dict(
-                    phrase=phrase,
-                    from_date=from_date,
-                    to_date=to_date,
-                    top_count=top_count,
-                ),
-            ):
-                rows.append(row[0])
-        return rows
+        return await pg.reader().fetchval(query, params)
 
 
 class Authors:
     """Query for authors table."""
 
     @classmethod
+    @single_flight
     async def top(
         cls,
-        pg: Engine,
-        phrase: str,
+        pg: AsyncDB,
+        query_id: Optional[int],
         from_date: str,
         to_date: str,
         top_count: int = 3,
     ):
-        """Top Authors."""
-        rows = []
-        query = text(
-            """
-            SELECT json_build_object(
-                'author_id', a.author_id,
-                'counter', sum(a.counter)) as data
-                FROM authors a JOIN query q ON a.query_id = q.id
-                WHERE lower(q.phrase) = lower(:phrase)
-                    AND a.published_at >= date(:from_date)
-                    AND a.published_at <= date(:to_date)
-                GROUP BY a.author_id
-                ORDER BY sum(a.counter) DESC
-                LIMIT :top_count
+        """Top Authors as JSON array made by PG."""
+        query = """
+            SELECT coalesce(json_agg(
+                json_build_object(
+                    'author_id', a.author_id, 'counter', a.counter
+                )
+                ORDER BY a.counter DESC
+            ), '[]')::text as data FROM (
+                SELECT a.author_id, sum(a.counter) AS counter
+                    FROM authors a
+                    WHERE a.query_id = :query_id
+                        AND a.published_at >= CAST(:from_date AS date)
+                        AND a.published_at <= CAST(:to_date AS date)
+                    GROUP BY a.author_id
+                    ORDER BY sum(a.counter) DESC
+                    LIMIT :top_count
+            ) a
             """
+        params = dict(
+            query_id=query_id,
+            from_date=iso_date(from_date),
+            to_date=iso_date(to_date),
+            top_count=top_count,
         )
-        async with pg.acquire() as conn:
-            async for row in conn.execute(
-                query,
-                dict(
-                    phrase=phrase,
-                    from_date=from_date,
-                    to_date=to_date,
-                    top_count=top_count,
-                ),
-            ):
-                rows.append(row[0])
-        return rows
+        return await pg.reader().fetchval(query, params)
+
+
+class Statistic:
+    """Query for all statistic of phrases at once."""
+
+    @classmethod
+    @single_flight
+    async def summary(
+        cls,
+        pg: AsyncDB,
+        phrases: Tuple[str, ...],
+        query_ids: Tuple[Optional[int], ...],
+        from_date: str,
+        to_date: str,
+        top_count: int = 3,
+    ) -> str:
+        """Tweets counter, top hashtags and top authors of each query.
+
+        All of them are counted by one statement the same way as
+        `Tweets.count_tweets`, `Hashtags.top` and `Authors.top` do.
+        Return JSON object made by PG, keyed by `phrases`
+        in order of `query_ids`.
+        """
+        query = """
+            SELECT coalesce(json_object_agg(q.phrase, json_build_object(
+                'counter', (
+                    coalesce((
+                        SELECT sum(d.counter)
+                        FROM tweets_daily d
+                        WHERE d.query_id = q.id
+                            AND d.published_at >= CAST(:from_date AS date)
+                            AND d.published_at < CAST(:to_date AS date)
+                    ), 0) + (
+                        SELECT count(t.id)
+                        FROM tweets t
+                        WHERE t.query_id = q.id
+                            AND t.published_at = CAST(:to_date AS date)
+                            AND CAST(:to_date AS date)
+                                >= CAST(:from_date AS date)
+                    )
+                )::bigint,
+                'hashtags', coalesce((
+                    SELECT json_agg(
+                        json_build_object('tag', h.tag, 'counter', h.counter)
+                        ORDER BY h.counter DESC
+                    ) FROM (
+                        SELECT h.tag, sum(h.counter) AS counter
+                            FROM hashtags h
+                            WHERE h.query_id = q.id
+                                AND h.published_at >= CAST(:from_date AS date)
+                                AND h.published_at <= CAST(:to_date AS date)
+                            GROUP BY h.tag
+                            ORDER BY sum(h.counter) DESC
+                            LIMIT :top_count
+                    ) h
+                ), '[]'),
+                'authors', coalesce((
+                    SELECT json_agg(
+                        json_build_object(
+                            'author_id', a.author_id, 'counter', a.counter
+                        )
+                        ORDER BY a.counter DESC
+                    ) FROM (
+                        SELECT a.author_id, sum(a.counter) AS counter
+                            FROM authors a
+                            WHERE a.query_id = q.id
+                                AND a.published_at >= CAST(:from_date AS date)
+                                AND a.published_at <= CAST(:to_date AS date)
+                            GROUP BY a.author_id
+                            ORDER BY sum(a.counter) DESC
+                            LIMIT :top_count
+                    ) a
+                ), '[]')
+            ) ORDER BY q.n), '{}')::text AS data
+            FROM unnest(
+                CAST(:query_ids AS bigint[]), CAST(:phrases AS text[])
+            ) WITH ORDINALITY q(id, phrase, n)
+            """
+        params = dict(
+            phrases=list(phrases),
+            query_ids=list(query_ids),
+            from_date=iso_date(from_date),
+            to_date=iso_date(to_date),
+            top_count=top_count,
+        )
+        return await pg.reader().fetchval(query, params)
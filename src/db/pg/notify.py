@@ -0,0 +1,115 @@
+"""PG notifications module."""
+
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from db.base import AsyncConnection, AsyncDB
+
+__all__ = ("Notifications",)
+
+# Callback of channel message, `None` when messages may be lost.
+Callback = Callable[[Optional[str]], None]
+
+
+class Notifications:
+    """Messages of channels delivered to all processes by PG `NOTIFY`.
+
+    Each process listens on one dedicated connection and calls
+    callbacks of channel with message of any process, own messages
+    are delivered at once by `publish`. Messages sent while connection
+    is lost are lost too, so on every (re)connect callbacks get `None`
+    and drop state which the messages keep up to date. Connection is
+    checked every `period` sec without messages.
+    """
+
+    def __init__(self, pg: AsyncDB, period: float = 5) -> None:
+        """Make notifications without connection, it's made by `start`."""
+        self._pg = pg
+        self._period = period
+        self._origin = uuid.uuid4().hex
+        self._callbacks: Dict[str, List[Callback]] = defaultdict(list)
+        self._conn: Optional[AsyncConnection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = False
+
+    def subscribe(self, channel: str, callback: Callback) -> None:
+        """Call `callback` with messages of channel."""
+        self._callbacks[channel].append(callback)
+
+    async def publish(self, channel: str, message: str) -> None:
+        """Deliver message to this process and send it to other ones.
+
+        Payload of PG `NOTIFY` is limited by 8000 bytes.
+        """
+        self._deliver(channel, message)
+        await self._pg.execute(
+            "SELECT pg_notify(:channel, :payload)",
+            dict(channel=channel, payload=f"{self._origin} {message}"),
+        )
+
+    async def startup(self, app) -> None:
+        """Start listening on application startup."""
+        self._task = asyncio.get_event_loop().create_task(self.run_forever())
+
+    async def cleanup(self, app) -> None:
+        """Stop listening and return connection into pool.
+
+        Loop which lost cancellation stops by `_stopped` in period.
+        """
+        self._stopped = True
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.wait({self._task})
+
+    async def run_forever(self) -> None:
+        """Listen, reconnect every period after connection is lost."""
+        while not self._stopped:
+            try:
+                await self.listen()
+            except self._pg.errors as e:
+                logging.error("Notifications are lost: %s", e)
+            finally:
+                await self.close()
+            if not self._stopped:
+                await asyncio.sleep(self._period)
+
+    async def listen(self) -> None:
+        """Deliver messages of other processes until stopped."""
+        self._conn = await self._pg.connect()
+        for channel in self._callbacks:
+            await self._conn.listen(channel)
+        for channel in self._callbacks:
+            self._deliver(channel, None)
+        while not self._stopped:
+            notification = await self._conn.notification(self._period)
+            if notification is None:
+                # Check connection even if nothing has changed.
+                await self._conn.fetchval("SELECT 1")
+                continue
+            channel, payload = notification
+            origin, _, message = payload.partition(" ")
+            if origin != self._origin:
+                self._deliver(channel, message)
+
+    async def close(self) -> None:
+        """Stop listening and return connection into pool."""
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            await conn.unlisten()
+        except self._pg.errors:
+            pass
+        finally:
+            await self._pg.release(conn)
+
+    def _deliver(self, channel: str, message: Optional[str]) -> None:
+        """Call callbacks of channel, failed one does not stop others."""
+        for callback in self._callbacks.get(channel, ()):
+            try:
+                callback(message)
+            except Exception:  # noqa pylint: disable=broad-except
+                logging.exception("Message of %s is not handled.", channel)
@@ -0,0 +1,158 @@
+"""Hot standby replicas for reads."""
+
+import asyncio
+import itertools
+import logging
+import time
+from typing import Dict, List, Optional
+
+from db.base import AsyncDB
+from metrics import DB_READS, REPLICA_LAG
+
+__all__ = ("Replica", "ReplicaSet")
+
+PRIMARY_LSN_QUERY = "SELECT CAST(pg_current_wal_lsn() AS text)"
+# Standby flag and lag of replayed WAL in sec, lag is `0` when WAL of
+# primary `:lsn` is replayed, so idle primary does not make it grow.
+LAG_QUERY = """
+    SELECT pg_is_in_recovery() AS standby, CASE
+        WHEN pg_last_wal_replay_lsn()
+            >= CAST(CAST(:lsn AS text) AS pg_lsn) THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END AS lag
+    """
+
+
+class Replica:
+    """Engine of replica and result of it's last health check."""
+
+    __slots__ = ("name", "db", "started", "healthy", "lag", "applied")
+
+    def __init__(self, name: str, db: AsyncDB) -> None:
+        """Make replica which is down until checked."""
+        self.name = name
+        self.db = db
+        self.started = False
+        self.healthy = False
+        self.lag = float("inf")
+        # Monotonic time up to which replica has replayed WAL.
+        self.applied = float("-inf")
+
+
+class ReplicaSet:
+    """Replicas of primary engine for reads which may be stale.
+
+    Each replica is checked every `period` sec, it serves reads while
+    it's a standby answering within period with lag up to `max_lag`
+    sec, reads are spread over such replicas by turns. With
+    `read_your_writes` replica serves reads only if it has replayed
+    WAL past the last write of this process (`AsyncDB.wrote`).
+    Otherwise, and when all replicas are down, reads go to primary.
+    Replica engine connects on first check, so app starts while
+    replicas are down, read which fails on replica between checks
+    is retried on primary.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncDB,
+        replicas: Dict[str, AsyncDB],
+        period: float = 5,
+        max_lag: float = 5,
+        read_your_writes: bool = False,
+    ) -> None:
+        """Make set of replicas `{name: engine}`."""
+        self.primary = primary
+        self.replicas: List[Replica] = [
+            Replica(name, db) for name, db in replicas.items()
+        ]
+        self.period = period
+        self.max_lag = max_lag
+        self.read_your_writes = read_your_writes
+        self._turn = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start health checks."""
+        self._task = loop.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        """Stop health checks and close replica engines."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        for replica in self.replicas:
+            if replica.started:
+                await replica.db.cleanup({})
+
+    async def run_forever(self) -> None:
+        """Check all replicas every period."""
+        while True:
+            await self.check_all()
+            await asyncio.sleep(self.period)
+
+    async def check_all(self) -> None:
+        """Check all replicas against current WAL position of primary."""
+        start = time.monotonic()
+        lsn = None
+        try:
+            lsn = await asyncio.wait_for(
+                self.primary.fetchval(PRIMARY_LSN_QUERY), self.period
+            )
+        except asyncio.CancelledError:
+            raise
+        except (asyncio.TimeoutError,) + self.primary.errors as e:
+            logging.debug("Primary WAL position check failed: %r", e)
+        await asyncio.gather(
+            *(self.check(replica, lsn, start) for replica in self.replicas)
+        )
+
+    async def check(
+        self, replica: Replica, lsn: Optional[str], start: float
+    ) -> None:
+        """Update health and lag of replica checked at `start`."""
+        lag = None
+        try:
+            if not replica.started:
+                await asyncio.wait_for(replica.db.startup({}), self.period)
+                replica.started = True
+            rows = await asyncio.wait_for(self.lag(replica, lsn), self.period)
+            if rows[0]["standby"] and rows[0]["lag"] is not None:
+                lag = float(rows[0]["lag"])
+        except asyncio.CancelledError:
+            raise
+        except (asyncio.TimeoutError,) + replica.db.errors as e:
+            logging.debug("Replica %s check failed: %r", replica.name, e)
+        healthy = lag is not None
+        if healthy and not replica.healthy:
+            logging.info("Replica %s is up.", replica.name)
+        elif replica.healthy and not healthy:
+            logging.warning("Replica %s is down.", replica.name)
+        replica.healthy = healthy
+        replica.lag = lag if lag is not None else float("inf")
+        replica.applied = start - replica.lag
+        REPLICA_LAG.set(replica.lag, (replica.name,))
+
+    @staticmethod
+    async def lag(replica: Replica, lsn: Optional[str]) -> List:
+        """Query replica itself, without fallback to primary."""
+        async with replica.db.acquire() as conn:
+            return await conn.fetch(LAG_QUERY, dict(lsn=lsn))
+
+    def pick(self) -> AsyncDB:
+        """Return engine for read, replica by turns or primary."""
+        fits = [
+            replica
+            for replica in self.replicas
+            if replica.healthy
+            and replica.lag <= self.max_lag
+            and (
+                not self.read_your_writes
+                or replica.applied >= AsyncDB.last_write
+            )
+        ]
+        if not fits:
+            DB_READS.inc(1, ("primary",))
+            return self.primary
+        DB_READS.inc(1, ("replica",))
+        return fits[next(self._turn) % len(fits)].db
@@ -0,0 +1,83 @@
+"""Single-flight coalescing of identical concurrent queries."""
+
+import asyncio
+import functools
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+__all__ = ("SingleFlight", "single_flight", "flights")
+
+
+class SingleFlight:
+    """Share one in-flight call and it's result between identical calls.
+
+    Call runs in it's own task, so cancelled caller does not cancel it
+    for others. Per-key stats of calls and coalesced calls are kept
+    for `stats_size` recently used keys.
+    """
+
+    def __init__(self, stats_size: int = 1024) -> None:
+        """Make empty single-flight group."""
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._stats: "OrderedDict[Hashable, Dict[str, int]]" = OrderedDict()
+        self._stats_size = stats_size
+        self._totals: Dict[str, int] = {"calls": 0, "coalesced": 0}
+
+    async def do(
+        self, key: Hashable, func: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Run `func` or join identical in-flight call with same `key`."""
+        stat = self._stat(key)
+        stat["calls"] += 1
+        self._totals["calls"] += 1
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._inflight[key] = future
+            future.add_done_callback(functools.partial(self._done, key))
+        else:
+            stat["coalesced"] += 1
+            self._totals["coalesced"] += 1
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[Hashable, Dict[str, int]]:
+        """Calls and coalesced calls per key."""
+        return {key: dict(stat) for key, stat in self._stats.items()}
+
+    def totals(self) -> Dict[str, int]:
+        """Calls and coalesced calls of all keys since start."""
+        return dict(self._totals)
+
+    def _stat(self, key: Hashable) -> Dict[str, int]:
+        """Get stat of key, forget least recently used keys."""
+        stat = self._stats.pop(key, None) or {"calls": 0, "coalesced": 0}
+        self._stats[key] = stat
+        while len(self._stats) > self._stats_size:
+            self._stats.popitem(last=False)
+        return stat
+
+    def _done(self, key: Hashable, future: asyncio.Future) -> None:
+        """Forget finished call, next call goes to DB again."""
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            # Mark exception as retrieved if all callers have gone.
+            future.exception()
+
+
+flights = SingleFlight()
+
+
+def single_flight(method: Callable) -> Callable:
+    """Coalesce identical concurrent calls of model query `method`.
+
+    Key is model, method name and call arguments except engine `pg`,
+    any engine gives the same answer.
+    """
+
+    @functools.wraps(method)
+    async def wrapper(cls, pg, *args, **kwargs):
+        key = (cls.__name__, method.__name__, args, frozenset(kwargs.items()))
+        return await flights.do(key, lambda: method(cls, pg, *args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,311 @@
+"""Process metrics in Prometheus text format.
+
+Counters and histograms are plain dicts updated in place, so hot
+paths pay for a dict lookup and, for histograms, a bisect. Each
+process (gunicorn worker) has it's own metrics, scraper sums them.
+Metrics are updated by DB, background tasks and web layers, they
+are served by `web.metrics`.
+"""
+
+import bisect
+from abc import ABC, abstractmethod
+from typing import Dict, List, Sequence, Tuple, TypeVar
+
+__all__ = (
+    "Metric",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "Registry",
+    "REGISTRY",
+)
+
+Labels = Tuple[str, ...]
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+WAIT_BUCKETS = (0.01, 0.1, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0)
+
+
+def escape(value: str) -> str:
+    """Escape label value."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def labels_text(names: Labels, values: Labels, extra: str = "") -> str:
+    """Return `{name="value",...}` or empty string without labels."""
+    pairs = [f'{n}="{escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def number(value: float) -> str:
+    """Format sample value."""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if value == int(value) else repr(value)
+
+
+class Metric(ABC):
+    """Metric with samples per label values."""
+
+    kind: str = "untyped"
+
+    def __init__(
+        self, name: str, description: str, labels: Labels = ()
+    ) -> None:
+        """Make metric without samples."""
+        self.name = name
+        self.description = description
+        self.labels = labels
+
+    def header(self) -> List[str]:
+        """Help and type lines."""
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    @abstractmethod
+    def render(self) -> List[str]:
+        """Exposition lines."""
+
+
+class Counter(Metric):
+    """Monotonic counter."""
+
+    kind = "counter"
+
+    def __init__(
+        self, name: str, description: str, labels: Labels = ()
+    ) -> None:
+        """Make counter."""
+        super().__init__(name, description, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, value: float = 1, labels: Labels = ()) -> None:
+        """Add `value` to counter of `labels` values."""
+        self._values[labels] = self._values.get(labels, 0) + value
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        """Set value of `labels` values, for totals counted elsewhere."""
+        self._values[labels] = value
+
+    def value(self, labels: Labels = ()) -> float:
+        """Return counter of `labels` values."""
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        """Exposition lines."""
+        return self.header() + [
+            f"{self.name}{labels_text(self.labels, values)} {number(value)}"
+            for values, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    """Value which goes up and down, usually set on scrape."""
+
+    kind = "gauge"
+
+
+class Histogram(Metric):
+    """Counts of observations by buckets, their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Labels = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        """Make histogram with upper bounds `buckets`."""
+        super().__init__(name, description, labels)
+        self._buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        """Count `value` observation.
+
+        Buckets are not cumulative in memory, only one is updated.
+        """
+        counts = self._values.get(labels)
+        if counts is None:
+            # Bucket counts, sum and count.
+            counts = self._values[labels] = [0] * (len(self._buckets) + 2)
+        counts[bisect.bisect_left(self._buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def count(self, labels: Labels = ()) -> int:
+        """Return count of observations of `labels` values."""
+        counts = self._values.get(labels)
+        return int(counts[-1]) if counts else 0
+
+    def quantile(self, q: float, labels: Labels = ()) -> float:
+        """Estimate `q` quantile by linear interpolation in it's bucket.
+
+        Values of the last `+Inf` bucket are estimated by the highest
+        bound, as Prometheus `histogram_quantile` does.
+        """
+        counts = self._values.get(labels)
+        if not counts or not counts[-1]:
+            return 0.0
+        rank = q * counts[-1]
+        cumulative = 0.0
+        lower = 0.0
+        for bound, count in zip(self._buckets, counts):
+            if count and cumulative + count >= rank:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound if bound != float("inf") else lower
+        return lower
+
+    def render(self) -> List[str]:
+        """Exposition lines."""
+        lines = self.header()
+        for values, counts in sorted(self._values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self._buckets, counts):
+                cumulative += count
+                le = 'le="{}"'.format(number(bound))
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{labels_text(self.labels, values, le)}"
+                    f" {number(cumulative)}"
+                )
+            text = labels_text(self.labels, values)
+            lines.append(f"{self.name}_sum{text} {number(counts[-2])}")
+            lines.append(f"{self.name}_count{text} {number(counts[-1])}")
+        return lines
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class Registry:
+    """Named metrics rendered together."""
+
+    def __init__(self) -> None:
+        """Make empty registry."""
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: M) -> M:
+        """Add metric, names are unique."""
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered!")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, description: str, labels: Labels = ()
+    ) -> Counter:
+        """Register counter."""
+        return self.register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: Labels = ()) -> Gauge:
+        """Register gauge."""
+        return self.register(Gauge(name, description, labels))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labels: Labels = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Register histogram."""
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def render(self) -> str:
+        """Exposition text of all metrics."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total",
+    "HTTP requests by route, method and status.",
+    ("route", "method", "status"),
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_seconds", "HTTP request latency by route.", ("route",)
+)
+TWITTER_REQUESTS = REGISTRY.counter(
+    "twitter_api_requests_total",
+    "Twitter API search requests by status.",
+    ("status",),
+)
+TWITTER_LATENCY = REGISTRY.histogram(
+    "twitter_api_request_seconds", "Twitter API search request latency."
+)
+RATE_LIMIT_WAIT = REGISTRY.histogram(
+    "twitter_rate_limit_wait_seconds",
+    "Time spent waiting for Twitter API rate limit slot.",
+    buckets=WAIT_BUCKETS,
+)
+TWEETS_FETCHED = REGISTRY.counter(
+    "tweets_fetched_total", "Tweets fetched from Twitter API."
+)
+TWEETS_INSERTED = REGISTRY.counter(
+    "tweets_inserted_total", "New tweets inserted into DB."
+)
+TWEETS_DUPLICATES = REGISTRY.counter(
+    "tweets_duplicates_total", "Saved tweets skipped as already stored."
+)
+TWEETS_SAVE_LATENCY = REGISTRY.histogram(
+    "tweets_save_seconds", "Latency of saving batch of tweets."
+)
+DB_ACQUIRE_WAIT = REGISTRY.histogram(
+    "db_acquire_seconds",
+    "Time spent waiting for DB pool connection by pool.",
+    ("pool",),
+)
+DB_READS = REGISTRY.counter(
+    "db_reads_total",
+    "Model reads which may be stale by engine (primary or replica).",
+    ("target",),
+)
+REPLICA_LAG = REGISTRY.gauge(
+    "db_replica_lag_seconds",
+    "Replication lag of replica at last health check, +Inf if it's down.",
+    ("replica",),
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "api_cache_requests_total",
+    "Statistic responses cache lookups by result.",
+    ("result",),
+)
+CACHE_ENTRIES = REGISTRY.gauge(
+    "api_cache_entries", "Statistic responses cache entries."
+)
+PIPELINE = REGISTRY.gauge(
+    "twitter_pipeline", "Write pipeline stats by name.", ("stat",)
+)
+FLIGHTS = REGISTRY.counter(
+    "singleflight_calls_total",
+    "Model query calls, coalesced ones joined in-flight call.",
+    ("kind",),
+)
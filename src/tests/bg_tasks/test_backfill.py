@@ -0,0 +1,65 @@
+"""Backfill test."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from bg_tasks.backfill import AsyncTwitterBackfill, split
+from bg_tasks.snowflake import TWEPOCH, snowflake
+from db.pg.models import Backfill, Query
+from web.settings import SettingsTest
+
+
+def test_split():
+    """Test windows cover range without gaps."""
+    start, end = datetime(2019, 9, 1), datetime(2019, 9, 2)
+    windows = split(start, end, 24)
+    assert len(windows) == 24
+    assert windows[0] == (start, start + timedelta(hours=1))
+    assert windows[-1][1] == end
+    assert all(a[1] == b[0] for a, b in zip(windows, windows[1:]))
+
+
+def test_snowflake():
+    """Test snowflake holds ms since Twitter epoch above 22 bits."""
+    moment = datetime(2019, 9, 3, 21, 31, 33, 626000)
+    tweet_id = snowflake(moment)
+    assert tweet_id >> 22 == 1567546293626 - TWEPOCH
+    assert tweet_id & ((1 << 22) - 1) == 0
+    assert snowflake(moment + timedelta(milliseconds=1)) > tweet_id
+
+
+async def test_failed_worker_stops_others(monkeypatch):
+    """Test failed window cancels other workers before session close."""
+    events = []
+
+    async def save(pg, phrase):
+        return 1
+
+    async def plan(pg, query_id, windows):
+        return windows
+
+    async def create_session():
+        pass
+
+    async def fill(pg, query_id, phrase, window):
+        if window == "bad":
+            raise ValueError(window)
+        try:
+            await asyncio.sleep(3600)
+        finally:
+            events.append("cancelled")
+
+    class Session:
+        async def close(self):
+            events.append("closed")
+
+    monkeypatch.setattr(Query, "save", save)
+    monkeypatch.setattr(Backfill, "plan", plan)
+    backfill = AsyncTwitterBackfill(SettingsTest(), concurrency=2)
+    monkeypatch.setattr(backfill, "create_session", create_session)
+    monkeypatch.setattr(backfill, "fill", fill)
+    backfill._session = Session()
+    with pytest.raises(ValueError):
+        await backfill.run(None, "phrase", ["good", "bad"])
+    assert events == ["cancelled", "closed"]
@@ -0,0 +1,82 @@
+"""Write pipeline test."""
+import asyncio
+
+from bg_tasks.pipeline import WritePipeline
+
+
+async def test_cancelled_put_is_not_pending():
+    """Test `put` cancelled on full queue does not block `written`."""
+
+    async def save(pg, rows):
+        await asyncio.sleep(3600)
+
+    pipeline = WritePipeline(save, queue_size=1, batch_size=1, batch_timeout=0)
+    pipeline.start(None)
+    await pipeline.put(1, [{}])  # taken by writer, which hangs on save
+    await pipeline.put(2, [{}])  # fills the queue
+    put = asyncio.ensure_future(pipeline.put(3, [{}]))
+    await asyncio.sleep(0.01)
+    assert not put.done()
+    put.cancel()
+    await asyncio.wait({put})
+    assert await asyncio.wait_for(pipeline.written(3), 1)
+    await pipeline.stop()
+
+
+async def test_batches_by_size_and_timeout():
+    """Test pages are coalesced up to batch size or batch timeout."""
+    batches = []
+
+    async def save(pg, rows):
+        batches.append(rows)
+
+    pipeline = WritePipeline(
+        save, queue_size=10, batch_size=3, batch_timeout=0.1
+    )
+    pipeline.start(None)
+    for i in range(4):
+        await pipeline.put(1, [i])
+    await asyncio.wait_for(pipeline.written(1), 1)
+    assert batches == [[0, 1, 2], [3]]
+    assert pipeline.stats()["max_batch_size"] == 3
+    await pipeline.stop()
+
+
+async def test_full_queue_blocks_put():
+    """Test `put` waits while writer is behind."""
+    release = asyncio.Event()
+
+    async def save(pg, rows):
+        await release.wait()
+
+    pipeline = WritePipeline(save, queue_size=1, batch_size=1, batch_timeout=0)
+    pipeline.start(None)
+    await pipeline.put(1, [0])
+    await pipeline.put(1, [1])
+    put = asyncio.ensure_future(pipeline.put(1, [2]))
+    await asyncio.sleep(0.01)
+    assert not put.done()
+    release.set()
+    await asyncio.wait_for(put, 1)
+    assert await asyncio.wait_for(pipeline.written(1), 1)
+    await pipeline.stop()
+
+
+async def test_written_after_failed_save():
+    """Test `written` reports failed batch of key once."""
+
+    async def save(pg, rows):
+        if rows == ["bad"]:
+            raise ValueError("not saved")
+
+    pipeline = WritePipeline(
+        save, queue_size=10, batch_size=1, batch_timeout=0
+    )
+    pipeline.start(None)
+    await pipeline.put(1, ["bad"])
+    await pipeline.put(2, ["good"])
+    assert not await asyncio.wait_for(pipeline.written(1), 1)
+    assert await asyncio.wait_for(pipeline.written(2), 1)
+    await pipeline.put(1, ["good"])
+    assert await asyncio.wait_for(pipeline.written(1), 1)
+    await pipeline.stop()
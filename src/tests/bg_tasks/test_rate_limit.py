@@ -0,0 +1,33 @@
+"""Rate limit test."""
+import time
+
+from bg_tasks.rate_limit import TokenBucket
+
+
+async def test_token_bucket_burst():
+    """Test requests do not wait while budget remains."""
+    bucket = TokenBucket(capacity=10, window=900)
+    start = time.time()
+    for _ in range(10):
+        await bucket.acquire()
+    assert time.time() - start < 0.1
+
+
+async def test_token_bucket_remaining_exhausted():
+    """Test requests wait for `x-rate-limit-reset` when budget is empty."""
+    bucket = TokenBucket(capacity=10, window=900)
+    reset = time.time() + 1
+    bucket.update(
+        200, {"x-rate-limit-remaining": "0", "x-rate-limit-reset": str(reset)}
+    )
+    await bucket.acquire()
+    assert time.time() >= reset
+
+
+async def test_token_bucket_too_many_requests():
+    """Test 429 blocks requests until reset."""
+    bucket = TokenBucket(capacity=10, window=900)
+    reset = time.time() + 1
+    bucket.update(429, {"x-rate-limit-reset": str(reset)})
+    await bucket.acquire()
+    assert time.time() >= reset
@@ -0,0 +1,44 @@
+"""Fair scheduler test."""
+import asyncio
+from collections import Counter
+
+from bg_tasks.scheduler import FairScheduler
+
+
+async def test_share_by_priority():
+    """Test busy key of priority 2 gets twice as many slots."""
+    grants = []
+
+    async def slot():
+        await asyncio.sleep(0)
+
+    async def worker(key):
+        while len(grants) < 30:
+            await scheduler.acquire(key)
+            grants.append(key)
+
+    scheduler = FairScheduler(slot)
+    scheduler.register("high", 2)
+    scheduler.register("low", 1)
+    workers = [asyncio.ensure_future(worker(k)) for k in ("high", "low")]
+    await asyncio.wait_for(asyncio.wait(workers), 1)
+    assert Counter(grants[:30]) == {"high": 20, "low": 10}
+    await scheduler.stop()
+
+
+async def test_cancelled_waiter_skipped():
+    """Test slot goes to next waiter when first one is cancelled."""
+    slots: asyncio.Queue = asyncio.Queue()
+    scheduler = FairScheduler(slots.get)
+    first = asyncio.ensure_future(scheduler.acquire("first"))
+    second = asyncio.ensure_future(scheduler.acquire("second"))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    slots.put_nowait(None)
+    await asyncio.wait_for(second, 1)
+    # Pump waits for next slot until it's stopped.
+    third = asyncio.ensure_future(scheduler.acquire("third"))
+    await asyncio.sleep(0.01)
+    await asyncio.wait_for(scheduler.stop(), 1)
+    assert not third.done()
+    third.cancel()
@@ -0,0 +1,65 @@
+"""Search page parser test."""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from bg_tasks.search import SearchPage, parse_created_at
+
+STATUS = {
+    "id": 1169015458930716672,
+    "id_str": "1169015458930716672",
+    "created_at": "Tue Sep 03 21:31:33 +0000 2019",
+    "text": 'Monty Python é tweet, with "quotes" and ]}',
+    "entities": {"hashtags": [{"text": "python", "indices": [0, 7]}]},
+    "user": {"id": 42, "name": "Brian", "entities": {"url": {}}},
+    "retweeted_status": {"id": 1, "user": {"id": 2}},
+}
+PAGE = {
+    "statuses": [STATUS, dict(STATUS, id=1, entities={"hashtags": []})],
+    "search_metadata": {"count": 2, "next_results": "?max_id=0"},
+}
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_search_page(size):
+    """Test page split into chunks of any size is parsed into tweets."""
+    body = json.dumps(PAGE, ensure_ascii=False).encode()
+    page = SearchPage()
+    tweets = []
+    for start in range(0, len(body), size):
+        chunk = body[start:][:size]
+        tweets.extend(page.feed(chunk))
+    tweets.extend(page.close())
+    assert [t.api_id for t in tweets] == [STATUS["id"], 1]
+    assert tweets[0].created_at == datetime(2019, 9, 3, 21, 31, 33)
+    assert tweets[0].text == STATUS["text"]
+    assert tweets[0].hashtags == ("python",)
+    assert tweets[1].hashtags == ()
+    assert tweets[0].author_id == 42
+    assert page.next_results == "?max_id=0"
+
+
+def test_search_page_cut():
+    """Test cut page and error response are not taken as empty page."""
+    body = json.dumps(PAGE).encode()
+    page = SearchPage()
+    page.feed(body[:-10])
+    with pytest.raises(ValueError):
+        page.close()
+    page = SearchPage()
+    page.feed(b'{"errors": [{"code": 88}]}')
+    with pytest.raises(ValueError):
+        page.close()
+
+
+def test_parse_created_at():
+    """Test API time is parsed as `strptime` does."""
+    moment = datetime(2019, 1, 1, 3, 4, 5)
+    for day in range(0, 365, 11):
+        value = (moment + timedelta(day)).strftime(
+            "%a %b %d %H:%M:%S +0000 %Y"
+        )
+        assert parse_created_at(value) == datetime.strptime(
+            value, "%a %b %d %H:%M:%S %z %Y"
+        ).replace(tzinfo=None)
@@ -0,0 +1,83 @@
+"""Streaming top-K test."""
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+from bg_tasks.topk import HeavyHitters, SpaceSaving, WindowTopK
+from web.settings import Settings
+
+
+def test_space_saving_error_bound():
+    """Test estimated counts are within `total / k` of true counts."""
+    random.seed(0)
+    stream = [int(random.paretovariate(1)) for _ in range(10000)]
+    summary = SpaceSaving(k=20)
+    for item in stream:
+        summary.add(item)
+    true = Counter(stream)
+    for item, counter in summary.counters.items():
+        assert true[item] <= counter <= true[item] + len(stream) / 20
+    for item, counter in true.most_common(3):
+        assert item in summary.counters
+
+
+def test_window_top_k_expire():
+    """Test items out of window are not counted."""
+    window = WindowTopK(k=10, window=600)
+    now = 10000.0
+    window.add(now - 700, "old", now)
+    window.add(now - 300, "a", now)
+    window.add(now - 30, "b", now)
+    window.add(now - 20, "b", now)
+    items, _ = window.top(3, 600, now)
+    assert items == [("b", 2), ("a", 1)]
+    items, _ = window.top(3, 60, now)
+    assert items == [("b", 2)]
+    window.expire(now + 700)
+    assert window.top(3, 600, now + 700)[0] == []
+
+
+def test_space_saving_least():
+    """Test least counted item is evicted as by full scan."""
+    random.seed(1)
+    summary = SpaceSaving(k=10)
+    for _ in range(2000):
+        least = min(summary.counters.values(), default=0)
+        item = random.randrange(30)
+        evicted = len(summary.counters) == summary.k
+        evicted = evicted and item not in summary.counters
+        summary.add(item, 2)
+        if evicted:
+            assert summary.counters[item] == least + 2
+        assert summary.counters[summary._heap[0]] == min(
+            summary.counters.values()
+        )
+
+
+def test_heavy_hitters_messages():
+    """Test rows counted by messages of any size match counted rows."""
+    settings = Settings()
+    settings.TOPK_COUNTERS = 1000
+    heavy_hitters = HeavyHitters(settings)
+    heavy_hitters.message_size = 100
+    now = datetime.utcnow()
+    rows = [
+        {
+            "published_at": now - timedelta(minutes=i % 20),
+            "hashtags": [f"Tag{i % 7}", "all"] if i % 3 else None,
+            "author_id": i % 11,
+            "query_id": 1,
+        }
+        for i in range(500)
+    ]
+    messages = list(heavy_hitters.messages(rows))
+    assert all(len(message) < 200 for message in messages)
+    for message in messages:
+        heavy_hitters.receive(message)
+    authors = Counter(row["author_id"] for row in rows)
+    top = heavy_hitters.top(1, "authors", 30, 3)
+    assert [item["counter"] for item in top] == [46, 46, 46]
+    assert all(authors[item["author_id"]] == 46 for item in top)
+    top = heavy_hitters.top(1, "hashtags", 30, 2)
+    assert top[0] == {"tag": "all", "counter": 333, "error": 0}
+    assert top[1]["tag"].startswith("tag")
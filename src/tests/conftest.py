@@ -1,20 +1,36 @@
 """Tests module."""
 import logging
 import time
+import uuid
 
 import pytest
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine.url import URL
+from sqlalchemy.exc import OperationalError
 from sqlalchemy_utils.functions import (
     create_database,
     database_exists,
     drop_database,
 )
 
+from bench.fake_twitter import FakeTwitter
+from db.pg.engine import create_pg
 from web.app import create_app
 from web.settings import SettingsTest
 
 
+def wait_for_db(dsn, timeout=30):
+    """Wait until PG accepts connections, return if DB exists."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return database_exists(dsn)
+        except OperationalError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
 @pytest.fixture(scope="session")
 def pg_dsn():
     """PG DSN."""
@@ -35,7 +51,7 @@ def pg_dsn():
 def pg_engine(pg_dsn):
     """pg_engine fixture for function or session scope."""
     dsn = pg_dsn
-    if database_exists(dsn):
+    if wait_for_db(dsn):
         drop_database(dsn)
     create_database(dsn)
     engine = create_engine(dsn)
@@ -44,8 +60,6 @@ def pg_engine(pg_dsn):
         escaped_sql = text(fd.read())
         logging.debug(escaped_sql)
         engine.execute(escaped_sql)
-    # wait for DB
-    time.sleep(10)
     # check DB
     engine.execute("""select * from tweets limit 1;""")
     # session
@@ -56,7 +70,36 @@ def pg_engine(pg_dsn):
 
 
 @pytest.fixture
-def test_app(loop, aiohttp_client):
-    """App  fixture."""
-    app = create_app(test=True)
+def pg(loop, pg_engine):
+    """Engine of test DB without application and it's tasks."""
+    engine = create_pg(SettingsTest(), loop)
+    loop.run_until_complete(engine.startup({}))
+    yield engine
+    loop.run_until_complete(engine.cleanup({}))
+
+
+@pytest.fixture
+def phrase():
+    """Phrase of test app, phrases of previous tests stay in DB."""
+    return f"cote {uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture
+def fake_twitter(loop, phrase):
+    """Fake Twitter API URL, tweets of `phrase` of last 5 hours."""
+    fake = FakeTwitter(volume=300, interval=60, limit=100000, phrases={phrase})
+    yield loop.run_until_complete(fake.start())
+    loop.run_until_complete(fake.stop())
+
+
+@pytest.fixture
+def test_app(loop, aiohttp_client, fake_twitter, phrase):
+    """App  fixture ingesting tweets from fake Twitter API."""
+    settings = SettingsTest(
+        TWITTER_API_URL=fake_twitter,
+        TWITTER_QUERY_PHRASE=phrase,
+        TWITTER_TASK_PERIOD=1,
+        TWITTER_RATE_LIMIT=100000,
+    )
+    app = create_app(settings=settings)
     return loop.run_until_complete(aiohttp_client(app))
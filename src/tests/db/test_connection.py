@@ -0,0 +1,13 @@
+"""Driver neutral connection test."""
+from db.pg.connection import positional
+
+
+def test_positional_params():
+    """Test `:name` params are numbered once and casts are kept."""
+    query, names = positional(
+        "SELECT :a::text, CAST(:b AS date) WHERE x = :a AND t > '10:00'"
+    )
+    assert query == (
+        "SELECT $1::text, CAST($2 AS date) WHERE x = $1 AND t > '10:00'"
+    )
+    assert names == ("a", "b")
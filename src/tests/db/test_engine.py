@@ -0,0 +1,18 @@
+"""Engine settings test."""
+from db.pg.engine import INGEST_PINNED, create_ingest_pg
+from web.settings import SettingsTest
+
+
+def test_ingest_pool():
+    """Test ingest pool has pinned connections and own timeout."""
+    settings = SettingsTest(
+        DB_INGEST_POOL_MIN_SIZE=1,
+        DB_INGEST_POOL_MAX_SIZE=2,
+        DB_STATEMENT_TIMEOUT=30,
+        DB_INGEST_STATEMENT_TIMEOUT=0,
+    )
+    ingest = create_ingest_pg(settings, None)
+    assert ingest.settings.DB_POOL_MIN_SIZE == 1 + INGEST_PINNED
+    assert ingest.settings.DB_POOL_MAX_SIZE == 2 + INGEST_PINNED
+    assert ingest.statement_timeout() == "0"
+    assert settings.DB_STATEMENT_TIMEOUT == 30
@@ -0,0 +1,25 @@
+"""PG advisory locks test."""
+import random
+
+from db.pg.lock import AdvisoryLocks
+
+
+async def test_locks_taken_over(pg):
+    """Test keys are taken by other connection once they are released."""
+    namespace = random.randint(1, 2**31 - 1)
+    first = AdvisoryLocks(pg, namespace)
+    second = AdvisoryLocks(pg, namespace)
+    try:
+        assert await first.sync([1, 2]) == {1, 2}
+        assert await second.sync([1, 2, 3]) == {3}
+        # Keys not asked any more are released.
+        assert await first.sync([1]) == {1}
+        assert await second.sync([1, 2, 3]) == {2, 3}
+        # Closed connection releases all it's keys.
+        await first.close()
+        assert first.held == set()
+        assert await second.sync([1, 2, 3]) == {1, 2, 3}
+        assert await first.sync([1, 2, 3]) == set()
+    finally:
+        await first.close()
+        await second.close()
@@ -0,0 +1,33 @@
+"""PG notifications test."""
+import asyncio
+
+from db.pg.notify import Notifications
+
+
+async def received(messages, count, timeout=10):
+    """Wait until `count` messages are received."""
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    while len(messages) < count and loop.time() < deadline:
+        await asyncio.sleep(0.05)
+    return messages
+
+
+async def test_notifications(pg_engine, test_app):
+    """Test message reaches other process and own one only once."""
+    app = test_app.server.app
+    other = Notifications(app["pg_ingest"], period=0.1)
+    messages = []
+    other.subscribe("test", messages.append)
+    await other.startup(app)
+    try:
+        # Listening starts with `None`, messages before it are lost.
+        assert await received(messages, 1) == [None]
+        own = []
+        app["notifications"].subscribe("test", own.append)
+        await app["notifications"].publish("test", "message")
+        assert await received(messages, 2) == [None, "message"]
+        await asyncio.sleep(0.2)
+        assert own == ["message"]
+    finally:
+        await other.cleanup(app)
@@ -0,0 +1,55 @@
+"""Partitions test."""
+import uuid
+from datetime import date, datetime
+
+from db.pg.models import Partitions, Query
+
+
+async def partitions(pg, month):
+    """Names of partitions of all tables of `YYYY_MM` month."""
+    names = [f"{table}_{month}" for table in Partitions.tables]
+    rows = await pg.fetch(
+        "SELECT name FROM unnest(CAST(:names AS text[])) name"
+        " WHERE to_regclass(name) IS NOT NULL",
+        dict(names=names),
+    )
+    return {row["name"] for row in rows}
+
+
+async def test_ensure_and_drop_before(pg):
+    """Test months are created once and dropped with their rollups."""
+    query_id = await Query.save(pg, f"partitions {uuid.uuid4().hex}")
+    await Partitions.ensure(pg, [date(2001, 1, 5), date(2001, 2, 28)])
+    assert len(await partitions(pg, "2001_01")) == 3
+    assert len(await partitions(pg, "2001_02")) == 3
+    for day in (date(2001, 1, 31), date(2001, 2, 1)):
+        await pg.execute(
+            "INSERT INTO tweets_daily (published_at, query_id)"
+            " VALUES (:day, :query_id)",
+            dict(day=day, query_id=query_id),
+        )
+        await pg.execute(
+            "INSERT INTO tweets_hourly (published_at, query_id)"
+            " VALUES (:moment, :query_id)",
+            dict(
+                moment=datetime(day.year, day.month, day.day),
+                query_id=query_id,
+            ),
+        )
+    try:
+        # Month of the day is kept whole.
+        assert await Partitions.drop_before(pg, date(2001, 2, 15)) >= 3
+        assert await partitions(pg, "2001_01") == set()
+        assert len(await partitions(pg, "2001_02")) == 3
+        for table in Partitions.rollups:
+            rows = await pg.fetch(
+                f"SELECT published_at FROM {table}"
+                " WHERE query_id = :query_id",
+                dict(query_id=query_id),
+            )
+            assert [row["published_at"].month for row in rows] == [2]
+        # Dropped month is not known any more, so it's created again.
+        await Partitions.ensure(pg, [date(2001, 1, 10)])
+        assert len(await partitions(pg, "2001_01")) == 3
+    finally:
+        await Partitions.drop_before(pg, date(2001, 3, 1))
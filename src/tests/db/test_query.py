@@ -0,0 +1,31 @@
+"""Phrase registry test."""
+from db.pg.models import Query
+
+
+class FakePG:
+    """Engine returning rows of `query` table."""
+
+    def __init__(self, rows):
+        """Make engine of `(lower(phrase), id)` rows."""
+        self.rows = rows
+        self.loads = 0
+
+    async def fetch(self, query, params=None):
+        """Count loads of registry."""
+        self.loads += 1
+        return self.rows
+
+
+async def test_query_ids_reload(monkeypatch):
+    """Test unknown phrases reload registry once in period."""
+    monkeypatch.setattr(Query, "_ids", {})
+    monkeypatch.setattr(Query, "_loaded", float("-inf"))
+    pg = FakePG([("monty", 1)])
+    assert await Query.get_ids(pg, ["Monty", "unknown"]) == [1, None]
+    assert await Query.get_id(pg, "other") is None
+    assert await Query.get_id(pg, "MONTY") == 1
+    assert pg.loads == 1
+    pg.rows = [("monty", 1), ("other", 2)]
+    monkeypatch.setattr(Query, "reload_period", 0)
+    assert await Query.get_id(pg, "other") == 2
+    assert pg.loads == 2
@@ -0,0 +1,40 @@
+"""Read replicas test."""
+from db.base import AsyncDB
+from db.replicas import ReplicaSet
+
+PRIMARY, FIRST, SECOND = object(), object(), object()
+
+
+def make_replicas(**kwargs) -> ReplicaSet:
+    """Return set of two healthy replicas without lag."""
+    replicas = ReplicaSet(
+        PRIMARY, {"first": FIRST, "second": SECOND}, **kwargs  # type: ignore
+    )
+    for replica in replicas.replicas:
+        replica.healthy, replica.lag, replica.applied = True, 0, 0
+    return replicas
+
+
+def test_pick_by_turns():
+    """Test reads are spread over replicas and go to primary without them."""
+    replicas = make_replicas()
+    assert {replicas.pick(), replicas.pick()} == {FIRST, SECOND}
+    for replica in replicas.replicas:
+        replica.healthy = False
+    assert replicas.pick() is PRIMARY
+
+
+def test_pick_lag():
+    """Test replica lagging behind `max_lag` is skipped."""
+    replicas = make_replicas(max_lag=1)
+    replicas.replicas[0].lag = 2
+    assert {replicas.pick(), replicas.pick()} == {SECOND}
+
+
+def test_pick_read_your_writes():
+    """Test reads go to primary until replicas replay the last write."""
+    replicas = make_replicas(read_your_writes=True)
+    AsyncDB.wrote()
+    assert replicas.pick() is PRIMARY
+    replicas.replicas[1].applied = float("inf")
+    assert replicas.pick() is SECOND
@@ -0,0 +1,58 @@
+"""Single-flight test."""
+import asyncio
+
+from db.singleflight import SingleFlight, single_flight
+
+
+class Model:
+    """Model counting it's DB calls."""
+
+    calls = 0
+
+    @classmethod
+    @single_flight
+    async def get(cls, pg, key):
+        """Return key after a while, fail on `bad` one."""
+        cls.calls += 1
+        await asyncio.sleep(0.01)
+        if key == "bad":
+            raise ValueError(key)
+        return key
+
+
+async def test_concurrent_calls_coalesced():
+    """Test identical concurrent calls make one call, others do not."""
+    calls = Model.calls
+    results = await asyncio.gather(
+        *(Model.get(None, "key") for _ in range(10)), Model.get(None, "other")
+    )
+    assert results == ["key"] * 10 + ["other"]
+    assert Model.calls == calls + 2
+    await Model.get(None, "key")
+    assert Model.calls == calls + 3
+
+
+async def test_error_reaches_every_caller():
+    """Test failed call raises in all callers."""
+    results = await asyncio.gather(
+        *(Model.get(None, "bad") for _ in range(3)), return_exceptions=True
+    )
+    assert [type(result) for result in results] == [ValueError] * 3
+
+
+async def test_cancelled_caller_does_not_cancel_call():
+    """Test call goes on for others when one caller is cancelled."""
+    group = SingleFlight()
+    done = asyncio.Event()
+
+    async def call():
+        await done.wait()
+        return 1
+
+    first = asyncio.ensure_future(group.do("key", call))
+    second = asyncio.ensure_future(group.do("key", call))
+    await asyncio.sleep(0)
+    first.cancel()
+    done.set()
+    assert await second == 1
+    assert group.totals() == {"calls": 2, "coalesced": 1}
@@ -0,0 +1,58 @@
+"""Tweets model test."""
+import uuid
+from datetime import datetime, timedelta
+
+from db.pg.models import Query, Tweets
+
+
+def make_rows(query_id, count):
+    """Rows of new tweets published in last minutes."""
+    now = datetime.utcnow().replace(microsecond=0)
+    return [
+        {
+            "api_id": uuid.uuid4().hex,
+            "published_at": now - timedelta(seconds=i),
+            "phrase": f"tweet {i}",
+            "hashtags": [f"tag{i % 3}", "all"],
+            "author_id": i % 4,
+            "query_id": query_id,
+        }
+        for i in range(count)
+    ]
+
+
+async def counters(pg, query_id):
+    """Hashtags, authors and daily counters of query."""
+    params = dict(query_id=query_id)
+    result = []
+    for query in (
+        "SELECT tag, counter FROM hashtags WHERE query_id = :query_id",
+        "SELECT author_id, counter FROM authors WHERE query_id = :query_id",
+        "SELECT counter FROM tweets_daily WHERE query_id = :query_id",
+    ):
+        result.append(
+            sorted(tuple(row) for row in await pg.fetch(query, params))
+        )
+    return result
+
+
+async def test_bulk_save(pg):
+    """Test bulk save skips duplicates and counts as `save` does."""
+    json_id = await Query.save(pg, f"json {uuid.uuid4().hex}")
+    bulk_id = await Query.save(pg, f"bulk {uuid.uuid4().hex}")
+    json_rows = make_rows(json_id, 20)
+    bulk_rows = [
+        dict(row, api_id=uuid.uuid4().hex, query_id=bulk_id)
+        for row in json_rows
+    ]
+    assert len(await Tweets.save(pg, json_rows)) == 20
+    inserted = await Tweets.bulk_save(pg, bulk_rows[:15])
+    assert sorted(inserted) == sorted(row["api_id"] for row in bulk_rows[:15])
+    # Stored rows are skipped, new ones of the same batch are inserted.
+    inserted = await Tweets.bulk_save(pg, bulk_rows)
+    assert sorted(inserted) == sorted(row["api_id"] for row in bulk_rows[15:])
+    assert await Tweets.bulk_save(pg, bulk_rows) == []
+    assert await Tweets.save(pg, bulk_rows) == []
+    expected = await counters(pg, json_id)
+    assert all(expected)
+    assert await counters(pg, bulk_id) == expected
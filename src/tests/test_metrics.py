@@ -0,0 +1,35 @@
+"""Metrics test."""
+from metrics import Registry
+
+
+def test_metrics_render():
+    """Test Prometheus text of counter and histogram."""
+    registry = Registry()
+    counter = registry.counter("requests_total", "Requests.", ("route",))
+    histogram = registry.histogram("latency_seconds", "Latency.", (), (1, 5))
+    counter.inc(1, ('/a"b',))
+    counter.inc(2, ('/a"b',))
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{route="/a\\"b"} 3',
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="5"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 14.5",
+        "latency_seconds_count 4",
+    ]
+
+
+def test_histogram_quantile():
+    """Test quantile is interpolated in it's bucket."""
+    histogram = Registry().histogram("latency_seconds", "Latency.", (), (1, 2))
+    for value in (0.5, 1.5, 1.5, 1.5):
+        histogram.observe(value)
+    assert histogram.quantile(0.25) == 1
+    assert histogram.quantile(0.5) == 1 + 1 / 3
+    assert Registry().histogram("empty", "Empty.").quantile(0.5) == 0
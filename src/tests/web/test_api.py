@@ -1,32 +1,206 @@
 """API test."""
 import asyncio
-import logging
+import json
+import time
+from collections import Counter
+from datetime import date, timedelta, timezone
 
+import aiohttp
 import pytest
 
+# Fake tweets are published in last hours, `to_date` day is counted
+# only at it's midnight.
+FROM_DATE = (date.today() - timedelta(days=1)).isoformat()
+TO_DATE = (date.today() + timedelta(days=1)).isoformat()
+# Tweets of phrase served by `fake_twitter` fixture.
+TWEETS = 300
+
 API_URLS = [
     "/api/v1/tweets/",
     "/api/v1/tweets/1/",
-    "/api/v1/statistic/top/hashtags/2019-09-09/2019-09-10/",
-    "/api/v1/statistic/top/authors/2019-09-09/2019-09-10/",
-    "/api/v1/statistic/tweets/2019-09-09/2019-09-10/",
+    "/api/v1/tweets/cursor/",
+    f"/api/v1/statistic/top/hashtags/{FROM_DATE}/{TO_DATE}/",
+    f"/api/v1/statistic/top/authors/{FROM_DATE}/{TO_DATE}/",
+    f"/api/v1/statistic/tweets/{FROM_DATE}/{TO_DATE}/",
+    f"/api/v1/statistic/summary/{FROM_DATE}/{TO_DATE}/?top=5",
+    "/api/v1/statistic/recent/hashtags/15/",
+    "/api/v1/statistic/recent/authors/15/",
 ]
 
 
+async def poll(client, url, ready=bool, timeout=30):
+    """Request `url` until it's data is `ready`, tweets are ingested."""
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    while True:
+        resp = await client.request("GET", url)
+        data = await resp.json()
+        if ready(data) or loop.time() > deadline:
+            return resp, data
+        await asyncio.sleep(0.1)
+
+
+async def ingested(client, timeout=30):
+    """Wait until all fake tweets of app phrase are saved, return them."""
+    app = client.server.app
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    while True:
+        rows = await app["pg"].fetch(
+            """
+            SELECT t.* FROM tweets t JOIN query q ON q.id = t.query_id
+                WHERE q.phrase = :phrase
+            """,
+            dict(phrase=app["settings"].TWITTER_QUERY_PHRASE),
+        )
+        if len(rows) >= TWEETS or loop.time() > deadline:
+            assert len(rows) == TWEETS
+            return rows
+        await asyncio.sleep(0.1)
+
+
+def assert_top(data, name, expected):
+    """Check top items have counters of ingested tweets."""
+    assert data
+    assert [item["counter"] for item in data] == [
+        counter for _, counter in expected.most_common(len(data))
+    ]
+    for item in data:
+        assert item["counter"] == expected[item[name]]
+
+
 @pytest.mark.parametrize(
     "test_input,expected", list(zip(API_URLS, [200] * len(API_URLS)))
 )
 async def test_api_urls(pg_engine, test_app, test_input, expected):
     """Test API URLS."""
-    await asyncio.sleep(3)
-    count = 10
-    while count > 0:
-        logging.debug("test_tweets %s", count)
-        resp = await test_app.request("GET", test_input)
-        assert resp.status == expected
-        json_data = await resp.json()
-        if not json_data:
-            count -= 1
-            await asyncio.sleep(5)
-        else:
+    resp, data = await poll(test_app, test_input)
+    assert resp.status == expected
+    assert data
+
+
+async def test_tweets_cursor(pg_engine, test_app):
+    """Test cursor pages hold every tweet once, newest first."""
+    rows = await ingested(test_app)
+    url = "/api/v1/tweets/cursor/"
+    pages = []
+    while True:
+        resp = await test_app.request("GET", url)
+        assert resp.status == 200
+        data = await resp.json()
+        pages.append((url, data))
+        if data["next"] is None:
             break
+        assert len(data["tweets"]) == 100
+        url = f"/api/v1/tweets/cursor/{data['next']}/"
+    tweets = [tweet for _, data in pages for tweet in data["tweets"]]
+    assert sorted(t["id"] for t in tweets) == sorted(r["id"] for r in rows)
+    keys = [(t["published_at"], t["id"]) for t in tweets]
+    assert keys == sorted(keys, reverse=True)
+    # Page of cursor is the same when it's requested again.
+    url, data = pages[1]
+    resp = await test_app.request("GET", url)
+    assert await resp.json() == data
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/api/v1/tweets/cursor/bm90LWEtY3Vyc29y/",
+        "/api/v1/statistic/top/hashtags/2019-13-01/2019-09-10/",
+        f"/api/v1/statistic/summary/{FROM_DATE}/{TO_DATE}/?top=0",
+        "/api/v1/statistic/recent/tweets/15/",
+    ],
+)
+async def test_api_bad_request(pg_engine, test_app, url):
+    """Test incorrect params are rejected."""
+    resp = await test_app.request("GET", url)
+    assert resp.status == 400
+
+
+async def test_statistic(pg_engine, test_app):
+    """Test statistic is counted from ingested tweets."""
+    rows = await ingested(test_app)
+    phrase = test_app.server.app["settings"].TWITTER_QUERY_PHRASE
+    hashtags = Counter(tag for row in rows for tag in row["hashtags"] or [])
+    authors = Counter(row["author_id"] for row in rows)
+    urls = {
+        "hashtags": f"/api/v1/statistic/top/hashtags/{FROM_DATE}/{TO_DATE}/",
+        "authors": f"/api/v1/statistic/top/authors/{FROM_DATE}/{TO_DATE}/",
+        "tweets": f"/api/v1/statistic/tweets/{FROM_DATE}/{TO_DATE}/",
+        "summary": f"/api/v1/statistic/summary/{FROM_DATE}/{TO_DATE}/?top=5",
+    }
+    data = {}
+    for name, url in urls.items():
+        resp = await test_app.request("GET", url)
+        assert resp.status == 200
+        data[name] = await resp.json()
+    assert_top(data["hashtags"], "tag", hashtags)
+    assert_top(data["authors"], "author_id", authors)
+    assert data["tweets"] == [{"counter": TWEETS}]
+    summary = data["summary"][phrase]
+    assert summary["counter"] == TWEETS
+    assert len(summary["hashtags"]) == 5
+    assert_top(summary["hashtags"], "tag", hashtags)
+    assert_top(summary["authors"], "author_id", authors)
+
+
+async def test_recent_top(pg_engine, test_app):
+    """Test recent top counts tweets of last minutes by minute buckets."""
+    rows = await ingested(test_app)
+    # Window holds whole minutes, so it starts with the minute
+    # of it's first second.
+    since = (time.time() - 15 * 60) // 60 * 60
+    recent = [
+        row
+        for row in rows
+        if row["published_at"].replace(tzinfo=timezone.utc).timestamp()
+        >= since
+    ]
+    hashtags = Counter(tag for row in recent for tag in row["hashtags"])
+    authors = Counter(row["author_id"] for row in recent)
+    for kind, name, expected in [
+        ("hashtags", "tag", hashtags),
+        ("authors", "author_id", authors),
+    ]:
+        _, data = await poll(
+            test_app,
+            f"/api/v1/statistic/recent/{kind}/15/",
+            lambda data: sum(item["counter"] for item in data)
+            == sum(counter for _, counter in expected.most_common(3)),
+        )
+        assert_top(data, name, expected)
+        assert all(item["error"] == 0 for item in data)
+
+
+async def test_tweets_export(pg_engine, test_app):
+    """Test tweets export is JSON lines of all tweets, oldest first."""
+    rows = await ingested(test_app)
+    resp = await test_app.request(
+        "GET", f"/api/v1/tweets/export/{FROM_DATE}/{TO_DATE}/"
+    )
+    assert resp.status == 200
+    assert resp.content_type == "application/x-ndjson"
+    lines = (await resp.text()).splitlines()
+    tweets = [json.loads(line) for line in lines]
+    assert sorted(t["id"] for t in tweets) == sorted(r["id"] for r in rows)
+    moments = [t["published_at"] for t in tweets]
+    assert moments == sorted(moments)
+
+
+async def test_tweets_export_limits(pg_engine, test_app):
+    """Test exports over pool size are rejected, timed out one is cut."""
+    app = test_app.server.app
+    await ingested(test_app)
+    url = f"/api/v1/tweets/export/{FROM_DATE}/{TO_DATE}/"
+    for _ in range(app["settings"].DB_EXPORT_POOL_SIZE):
+        await app["exports"].acquire()
+    resp = await test_app.request("GET", url)
+    assert resp.status == 503
+    for _ in range(app["settings"].DB_EXPORT_POOL_SIZE):
+        app["exports"].release()
+    app["settings"].API_EXPORT_TIMEOUT = 0
+    resp = await test_app.request("GET", url)
+    assert resp.status == 200
+    with pytest.raises(aiohttp.ClientPayloadError):
+        await resp.read()
@@ -0,0 +1,60 @@
+"""Response cache test."""
+from datetime import date
+
+from web.cache import ResponseCache
+
+
+def test_cache_lru_eviction():
+    """Test least recently used entry is evicted."""
+    cache = ResponseCache(maxsize=2, ttl=60)
+    day = date(2019, 9, 9)
+    cache.set("a", b"1", ["cote"], day, day)
+    cache.set("b", b"2", ["cote"], day, day)
+    assert cache.get("a")
+    cache.set("c", b"3", ["cote"], day, day)
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+
+
+def test_cache_ttl():
+    """Test expired entry is not returned."""
+    cache = ResponseCache(maxsize=2, ttl=0)
+    cache.set("a", b"1", ["cote"], date(2019, 9, 9), date(2019, 9, 9))
+    assert cache.get("a") is None
+
+
+def test_cache_invalidate_by_days():
+    """Test only entries of phrase covering written days are dropped."""
+    cache = ResponseCache(maxsize=10, ttl=60)
+    cache.set("old", b"1", ["cote"], date(2019, 9, 1), date(2019, 9, 5))
+    cache.set("new", b"2", ["cote"], date(2019, 9, 6), date(2019, 9, 10))
+    cache.set("other", b"3", ["monty"], date(2019, 9, 6), date(2019, 9, 10))
+    cache.invalidate("Cote", [date(2019, 9, 8)])
+    assert cache.get("old")
+    assert cache.get("new") is None
+    assert cache.get("other")
+
+
+def test_cache_invalidate_any_phrase():
+    """Test entry of many phrases is dropped by any of them."""
+    cache = ResponseCache(maxsize=10, ttl=60)
+    day = date(2019, 9, 9)
+    cache.set("both", b"1", ["Cote", "monty"], day, day)
+    cache.invalidate("cote", [date(2019, 9, 10)])
+    assert cache.get("both")
+    cache.invalidate("Monty", [day])
+    assert cache.get("both") is None
+
+
+def test_cache_generation():
+    """Test response fetched before invalidation is not stored."""
+    cache = ResponseCache(maxsize=10, ttl=60)
+    day = date(2019, 9, 9)
+    generation = cache.generation
+    cache.receive(cache.message("Cote", [day]))
+    assert cache.set("a", b"1", ["cote"], day, day, generation)
+    assert cache.get("a") is None
+    cache.set("a", b"1", ["cote"], day, day, cache.generation)
+    assert cache.get("a")
+    cache.receive(None)
+    assert cache.get("a") is None
@@ -0,0 +1,20 @@
+"""JSON encoders test."""
+import json
+
+import pytest
+
+from web.encoder import ENCODERS, get_encoder
+
+
+@pytest.mark.parametrize("name", list(ENCODERS))
+def test_encoders(name):
+    """Test encoders make the same JSON."""
+    data = {"tag": "ö", "counter": 1, "items": [None, 1.5, True]}
+    assert json.loads(get_encoder(name)(data)) == data
+
+
+def test_get_encoder():
+    """Test auto and unknown encoders."""
+    assert get_encoder("auto") in ENCODERS.values()
+    with pytest.raises(ValueError):
+        get_encoder("unknown")
@@ -1,10 +1,16 @@
 """API module."""
 
+import asyncio
+import base64
+import logging
 from datetime import datetime
+from functools import partial
 
 from aiohttp import web
 
-from db.pg.models import Authors, Hashtags, Tweets
+from db.pg.models import Authors, Hashtags, Query, Statistic, Tweets
+from web.cache import cached_json_response
+from web.encoder import json_response, raw_json_response
 
 
 async def tweets(request):
@@ -38,13 +44,79 @@ async def tweets(request):
         return web.Response(text="Incorrect offset!", status=400)
 
     settings = request.app["settings"]
+    pg = request.app["pg"]
     res = await Tweets.unique_tweets(
-        request.app["pg"],
-        settings.TWITTER_QUERY_PHRASE,
+        pg,
+        await Query.get_id(pg, settings.TWITTER_QUERY_PHRASE),
         settings.TWITTER_LAST_TWEETS_COUNT,
         offset,
     )
-    return web.json_response(res)
+    return raw_json_response(res)
+
+
+def encode_cursor(published_at, tweet_id):
+    """Make opaque cursor pointing after tweet `(published_at, id)`."""
+    value = f"{published_at.isoformat()}|{tweet_id}"
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(request):
+    """Validate cursor param, return `published_at` and `id` from it."""
+    cursor = request.match_info.get("cursor")
+    if not cursor:
+        return None, None
+    value = base64.urlsafe_b64decode(cursor.encode()).decode()
+    published_at, tweet_id = value.split("|")
+    return datetime.fromisoformat(published_at).isoformat(), int(tweet_id)
+
+
+async def tweets_cursor(request):
+    """Tweets page by cursor.
+
+    :param request: Context injected by aiohttp framework
+    :type request: RequestHandler
+
+    ---
+    description:
+        Return page of last tweets and `next` cursor for next page,
+        `next` is `null` on the last page. Max page size is `100`
+        tweets. Every page costs the same, pages are stable
+        when new tweets are saved.
+    tags:
+    - All unique tweets
+    produces:
+    - application/json
+    parameters:
+    - in: path
+      name: cursor
+      required: false
+      type: string
+    responses:
+        "200":
+            description: successful operation.
+        "400":
+            description: incorrect operation.
+    """
+    try:
+        published_at, tweet_id = decode_cursor(request)
+    except Exception:  # noqa pylint: disable=broad-except
+        return web.Response(text="Incorrect cursor!", status=400)
+
+    settings = request.app["settings"]
+    count = min([settings.TWITTER_LAST_TWEETS_COUNT, 100])
+    pg = request.app["pg"]
+    res, last = await Tweets.tweets_after(
+        pg,
+        await Query.get_id(pg, settings.TWITTER_QUERY_PHRASE),
+        count,
+        published_at,
+        tweet_id,
+    )
+    next_cursor = encode_cursor(*last) if last else None
+    dumps = request.app["json_dumps"]
+    return raw_json_response(
+        b'{"tweets":%s,"next":%s}' % (res.encode(), dumps(next_cursor))
+    )
 
 
 def validate_date(request):
@@ -96,10 +168,16 @@ async def top_hashtags(request):
         return web.Response(text="Incorrect dates!", status=400)
 
     settings = request.app["settings"]
-    res = await Hashtags.top(
-        request.app["pg"], settings.TWITTER_QUERY_PHRASE, from_date, to_date
+    phrase = settings.TWITTER_QUERY_PHRASE
+    pg = request.app["pg"]
+    query_id = await Query.get_id(pg, phrase)
+    return await cached_json_response(
+        request,
+        [phrase],
+        from_date,
+        to_date,
+        partial(Hashtags.top, pg, query_id, from_date, to_date),
     )
-    return web.json_response(res)
 
 
 async def top_authors(request):
@@ -138,10 +216,16 @@ async def top_authors(request):
         return web.Response(text="Incorrect dates!", status=400)
 
     settings = request.app["settings"]
-    res = await Authors.top(
-        request.app["pg"], settings.TWITTER_QUERY_PHRASE, from_date, to_date
+    phrase = settings.TWITTER_QUERY_PHRASE
+    pg = request.app["pg"]
+    query_id = await Query.get_id(pg, phrase)
+    return await cached_json_response(
+        request,
+        [phrase],
+        from_date,
+        to_date,
+        partial(Authors.top, pg, query_id, from_date, to_date),
     )
-    return web.json_response(res)
 
 
 async def count_tweets(request):
@@ -180,7 +264,240 @@ async def count_tweets(request):
         return web.Response(text="Incorrect dates!", status=400)
 
     settings = request.app["settings"]
-    res = await Tweets.count_tweets(
-        request.app["pg"], settings.TWITTER_QUERY_PHRASE, from_date, to_date
+    phrase = settings.TWITTER_QUERY_PHRASE
+    pg = request.app["pg"]
+    query_id = await Query.get_id(pg, phrase)
+    return await cached_json_response(
+        request,
+        [phrase],
+        from_date,
+        to_date,
+        partial(Tweets.count_tweets, pg, query_id, from_date, to_date),
+    )
+
+
+async def statistic_summary(request):
+    """Statistic summary.
+
+    :param request: Context injected by aiohttp framework
+    :type request: RequestHandler
+
+    ---
+    description:
+        Return `counter` of `tweets`, TOP `top` `hashtags` and `authors`
+        of each `phrase` for given date range `from_date` and `to_date`,
+        all of them are counted by one DB query. Up to `20` phrases,
+        configured phrase by default.
+    tags:
+    - Statistic summary
+    produces:
+    - application/json
+    parameters:
+    - in: path
+      name: from_date
+      required: true
+      type: string
+      description: example 2019-09-09
+    - in: path
+      name: to_date
+      required: true
+      type: string
+      description: example 2019-09-10
+    - in: query
+      name: phrase
+      required: false
+      type: array
+      items:
+        type: string
+      collectionFormat: multi
+    - in: query
+      name: top
+      required: false
+      type: integer
+      description: from 1 to 100, default 3
+    responses:
+        "200":
+            description: successful operation.
+        "400":
+            description: incorrect operation.
+    """
+    from_date, to_date = validate_date(request)
+    if not from_date:
+        return web.Response(text="Incorrect dates!", status=400)
+
+    settings = request.app["settings"]
+    phrases = request.query.getall("phrase", [settings.TWITTER_QUERY_PHRASE])
+    phrases = list({phrase.lower(): phrase for phrase in phrases}.values())
+    try:
+        top = int(request.query.get("top", 3))
+    except Exception:  # noqa pylint: disable=broad-except
+        top = 0
+    if not (0 < top <= 100) or len(phrases) > 20:
+        return web.Response(text="Incorrect phrases or top!", status=400)
+
+    pg = request.app["pg"]
+    query_ids = await Query.get_ids(pg, phrases)
+
+    return await cached_json_response(
+        request,
+        phrases,
+        from_date,
+        to_date,
+        partial(
+            Statistic.summary,
+            pg,
+            tuple(phrases),
+            tuple(query_ids),
+            from_date,
+            to_date,
+            top,
+        ),
+        (top,),
+    )
+
+
+async def tweets_export(request):
+    """Export tweets.
+
+    :param request: Context injected by aiohttp framework
+    :type request: RequestHandler
+
+    ---
+    description:
+        Stream all tweets of `phrase` published from `from_date`
+        to the end of `to_date` day as JSON lines, ordered by
+        publication. Configured phrase by default. Response is
+        gzip compressed when client accepts it.
+    tags:
+    - All unique tweets
+    produces:
+    - application/x-ndjson
+    parameters:
+    - in: path
+      name: from_date
+      required: true
+      type: string
+      description: example 2019-09-09
+    - in: path
+      name: to_date
+      required: true
+      type: string
+      description: example 2019-09-10
+    - in: query
+      name: phrase
+      required: false
+      type: string
+    responses:
+        "200":
+            description: successful operation.
+        "400":
+            description: incorrect operation.
+    """
+    from_date, to_date = validate_date(request)
+    if not from_date:
+        return web.Response(text="Incorrect dates!", status=400)
+
+    settings = request.app["settings"]
+    phrase = request.query.get("phrase", settings.TWITTER_QUERY_PHRASE)
+    query_id = await Query.get_id(request.app["pg"], phrase)
+    exports = request.app["exports"]
+    if exports.locked():
+        return web.Response(text="Too many exports!", status=503)
+
+    async with exports:
+        response = web.StreamResponse(
+            headers={"Content-Type": "application/x-ndjson; charset=utf-8"}
+        )
+        if "gzip" in request.headers.get("Accept-Encoding", "").lower():
+            response.enable_compression(web.ContentCoding.gzip)
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        if not await export_lines(
+            request, response, query_id, from_date, to_date
+        ):
+            # Stream is cut without last chunk, so client sees it's broken.
+            logging.warning("Export to %s is timed out.", request.remote)
+            if request.transport is not None:
+                request.transport.close()
+            return response
+        await response.write_eof()
+        return response
+
+
+async def export_lines(request, response, query_id, from_date, to_date):
+    """Write export lines, return `False` if it's timed out.
+
+    Write waits for slow client, so next batch is not fetched until
+    previous one is sent. Generator is closed to free cursor and
+    connection at once when client is gone or timed out.
+    """
+    settings = request.app["settings"]
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + settings.API_EXPORT_TIMEOUT
+    batches = Tweets.export(
+        request.app["pg_export"], query_id, from_date, to_date
+    )
+    try:
+        async for lines in batches:
+            timeout = min(
+                settings.API_EXPORT_WRITE_TIMEOUT, deadline - loop.time()
+            )
+            await asyncio.wait_for(
+                response.write("".join(lines).encode()), max(timeout, 0)
+            )
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        await batches.aclose()
+    return True
+
+
+async def recent_top(request):
+    """Recent top hashtags or authors.
+
+    :param request: Context injected by aiohttp framework
+    :type request: RequestHandler
+
+    ---
+    description:
+        Return TOP 3 `hashtags` or `authors` with `counter`
+        for last `minutes`, answered from memory without DB.
+        Each `counter` differs from true one by at most `error`.
+    tags:
+    - Recent top
+    produces:
+    - application/json
+    parameters:
+    - in: path
+      name: kind
+      required: true
+      type: string
+      description: hashtags or authors
+    - in: path
+      name: minutes
+      required: true
+      type: integer
+      description: example 15
+    responses:
+        "200":
+            description: successful operation.
+        "400":
+            description: incorrect operation.
+    """
+    settings = request.app["settings"]
+    heavy_hitters = request.app["heavy_hitters"]
+    kind = request.match_info.get("kind")
+    try:
+        minutes = int(request.match_info.get("minutes"))
+    except Exception:  # noqa pylint: disable=broad-except
+        minutes = 0
+    if kind not in heavy_hitters.kinds or not (
+        0 < minutes <= settings.TOPK_WINDOW
+    ):
+        return web.Response(text="Incorrect kind or minutes!", status=400)
+
+    query_id = await Query.get_id(
+        request.app["pg"], settings.TWITTER_QUERY_PHRASE
     )
-    return web.json_response(res)
+    res = heavy_hitters.top(query_id, kind, minutes)
+    return json_response(request, res)
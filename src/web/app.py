@@ -1,39 +1,94 @@
 """Bse application module."""
 
+import asyncio
 import logging
+from typing import Optional
 
 from aiohttp import web
 from aiohttp.web import Application
 from aiohttp_swagger import setup_swagger
 
+from bg_tasks.partitions import AsyncPartitionTasks
+from bg_tasks.topk import HeavyHitters
 from bg_tasks.twitter import AsyncTwitterTasks
-from db.pg.engine import AsyncPG
+from db.pg.engine import create_export_pg, create_ingest_pg, create_pg
+from db.pg.models import Query
+from db.pg.notify import Notifications
+from web.cache import ResponseCache
+from web.encoder import get_encoder
+from web.metrics import metrics_middleware
 from web.routes import setup_routes
 from web.settings import Settings, SettingsTest
 
 __all__ = ("create_app",)
 
 
-def create_app(test=False) -> Application:
+async def load_query_ids(app: Application) -> None:
+    """Load phrase registry on startup, see `Query.get_id`."""
+    await Query.load_ids(app["pg"])
+
+
+async def create_exports(app: Application) -> None:
+    """Make slots of concurrent exports, one per `app["pg_export"]` conn."""
+    app["exports"] = asyncio.Semaphore(app["settings"].DB_EXPORT_POOL_SIZE)
+
+
+def create_app(
+    test: bool = False, settings: Optional[Settings] = None
+) -> Application:
     """Create instance of application.
 
-    Setup hooks, engine and API routes.
+    Setup hooks, engines and API routes.
     Start web server and base periodic
-    background task `AsyncTwitterTasks`.
+    background tasks `AsyncTwitterTasks`, `AsyncPartitionTasks`
+    and `HeavyHitters`. API queries `app["pg"]` engine, background
+    tasks query `app["pg_ingest"]` engine with it's own pool, exports
+    query `app["pg_export"]` one.
+    Cache invalidations and recent top counts of ingest reach all
+    processes by `app["notifications"]`.
     """
-    app = web.Application()
-    settings = SettingsTest() if test else Settings()
+    app = web.Application(middlewares=[metrics_middleware])
+    if settings is None:
+        settings = SettingsTest() if test else Settings()
     logging.basicConfig(level=settings.LOGGING_LEVEL)
     app.update(name="Social network", settings=settings)
+    app["cache"] = ResponseCache(
+        settings.API_CACHE_SIZE, settings.API_CACHE_TTL
+    )
+    app["json_dumps"] = get_encoder(settings.API_JSON_ENCODER)
 
-    pg_engine = AsyncPG(settings, app.loop)
+    pg_engine = create_pg(settings, app.loop)
     app.on_startup.append(pg_engine.startup)
-    app.on_cleanup.append(pg_engine.cleanup)
+    ingest_engine = create_ingest_pg(settings, app.loop)
+    app.on_startup.append(ingest_engine.startup)
+    app.on_startup.append(load_query_ids)
+    export_engine = create_export_pg(settings, app.loop)
+    app.on_startup.append(export_engine.startup)
+    app.on_startup.append(create_exports)
+
+    notifications = Notifications(ingest_engine)
+    notifications.subscribe("cache", app["cache"].receive)
+    app["notifications"] = notifications
+    app.on_startup.append(notifications.startup)
 
     twitter = AsyncTwitterTasks(settings)
     app.on_startup.append(twitter.startup_bg_tasks)
     app.on_cleanup.append(twitter.cleanup_bg_tasks)
 
+    partitions = AsyncPartitionTasks(settings)
+    app.on_startup.append(partitions.startup_bg_tasks)
+    app.on_cleanup.append(partitions.cleanup_bg_tasks)
+
+    heavy_hitters = HeavyHitters(settings, notifications)
+    app["heavy_hitters"] = heavy_hitters
+    app.on_startup.append(heavy_hitters.startup_bg_tasks)
+    app.on_cleanup.append(heavy_hitters.cleanup_bg_tasks)
+    # Pools are closed after background tasks released their connections.
+    app.on_cleanup.append(notifications.cleanup)
+    app.on_cleanup.append(ingest_engine.cleanup)
+    app.on_cleanup.append(export_engine.cleanup)
+    app.on_cleanup.append(pg_engine.cleanup)
+
     setup_routes(app)
     setup_swagger(app, swagger_url="/api/v1/doc")
     return app
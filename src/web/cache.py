@@ -0,0 +1,195 @@
+"""Cache for API responses."""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from email.utils import formatdate
+from typing import (
+    Awaitable,
+    Callable,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from aiohttp import web
+
+from metrics import CACHE_REQUESTS
+from web.encoder import raw_json_response
+
+__all__ = ("ResponseCache", "cached_json_response")
+
+
+class Entry(NamedTuple):
+    """Cached response body with it's validators."""
+
+    body: bytes
+    etag: str
+    last_modified: float
+    expires: float
+    phrases: FrozenSet[str]
+    from_date: date
+    to_date: date
+
+
+class ResponseCache:
+    """In-process LRU cache with TTL for statistic responses.
+
+    Entries are keyed by endpoint, phrases and date range. Ingest calls
+    `invalidate` with days of saved tweets, it drops only entries
+    of the phrase whose date range covers one of these days. Ingest
+    of any process publishes `message` of invalidation, each process
+    applies it by `receive`. Every invalidation bumps `generation`,
+    so response fetched before it is not stored by `set`.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        """Make empty cache."""
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries: "OrderedDict[Hashable, Entry]" = OrderedDict()
+        self.generation = 0
+
+    def get(self, key: Hashable) -> Optional[Entry]:
+        """Return fresh entry and mark it as recently used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(
+        self,
+        key: Hashable,
+        body: bytes,
+        phrases: Iterable[str],
+        from_date: date,
+        to_date: date,
+        generation: Optional[int] = None,
+    ) -> Entry:
+        """Store response body, evict least recently used entries.
+
+        Body fetched at older `generation` is returned as entry,
+        but it's not stored.
+        """
+        now = time.time()
+        entry = Entry(
+            body=body,
+            etag='"{}"'.format(hashlib.md5(body).hexdigest()),
+            last_modified=now,
+            expires=now + self._ttl,
+            phrases=frozenset(phrase.lower() for phrase in phrases),
+            from_date=from_date,
+            to_date=to_date,
+        )
+        if generation is not None and generation != self.generation:
+            return entry
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, phrase: str, days: Iterable[date]) -> None:
+        """Drop entries of `phrase` which date range covers any of `days`."""
+        phrase = phrase.lower()
+        days = set(days)
+        if not days:
+            return
+        self.generation += 1
+        first, last = min(days), max(days)
+        for key, entry in list(self._entries.items()):
+            if (
+                phrase in entry.phrases
+                and entry.from_date <= last
+                and entry.to_date >= first
+                and any(entry.from_date <= d <= entry.to_date for d in days)
+            ):
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        self.generation += 1
+        self._entries.clear()
+
+    @staticmethod
+    def message(phrase: str, days: Iterable[date]) -> str:
+        """Return invalidation message of `receive`."""
+        return json.dumps(
+            {"phrase": phrase, "days": sorted(d.isoformat() for d in days)}
+        )
+
+    def receive(self, message: Optional[str]) -> None:
+        """Apply invalidation `message`, `None` drops all entries."""
+        if message is None:
+            self.clear()
+            return
+        data = json.loads(message)
+        self.invalidate(
+            data["phrase"], (date.fromisoformat(d) for d in data["days"])
+        )
+
+    def __len__(self) -> int:
+        """Count of entries."""
+        return len(self._entries)
+
+
+def not_modified(request: web.Request, entry: Entry) -> bool:
+    """Check conditional request headers against entry validators."""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        return entry.etag in [tag.strip() for tag in if_none_match.split(",")]
+    if_modified_since = request.if_modified_since
+    if if_modified_since is not None:
+        last_modified = datetime.fromtimestamp(
+            int(entry.last_modified), timezone.utc
+        )
+        return last_modified <= if_modified_since
+    return False
+
+
+async def cached_json_response(
+    request: web.Request,
+    phrases: Iterable[str],
+    from_date: str,
+    to_date: str,
+    fetch: Callable[[], Awaitable[str]],
+    params: Tuple = (),
+) -> web.Response:
+    """Return cached JSON response or `fetch` JSON text and cache it.
+
+    Other `params` of response are part of cache key.
+    Response carries `ETag` and `Last-Modified`, so client
+    gets 304 while it's copy is valid.
+    """
+    cache: ResponseCache = request.app["cache"]
+    phrases = tuple(phrase.lower() for phrase in phrases)
+    key = (request.match_info.route.name, phrases, from_date, to_date, params)
+    entry = cache.get(key)
+    CACHE_REQUESTS.inc(1, ("miss" if entry is None else "hit",))
+    if entry is None:
+        generation = cache.generation
+        body = (await fetch()).encode()
+        entry = cache.set(
+            key,
+            body,
+            phrases,
+            datetime.fromisoformat(from_date).date(),
+            datetime.fromisoformat(to_date).date(),
+            generation,
+        )
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": formatdate(entry.last_modified, usegmt=True),
+    }
+    if not_modified(request, entry):
+        return web.Response(status=304, headers=headers)
+    return raw_json_response(entry.body, headers)
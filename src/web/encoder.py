@@ -0,0 +1,55 @@
+"""Pluggable JSON encoders of API responses.
+
+Most of responses are JSON rendered by PG and passed as is,
+encoders serialize only values made in Python.
+"""
+
+import json
+from typing import Any, Callable, Dict, Optional, Union
+
+from aiohttp import web
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+__all__ = ("ENCODERS", "get_encoder", "json_response", "raw_json_response")
+
+Encoder = Callable[[Any], bytes]
+
+
+def stdlib_dumps(obj: Any) -> bytes:
+    """Encode by stdlib `json`."""
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+ENCODERS: Dict[str, Encoder] = {"json": stdlib_dumps}
+if orjson is not None:
+    ENCODERS["orjson"] = orjson.dumps
+
+
+def get_encoder(name: str) -> Encoder:
+    """Return encoder by name, `auto` is the fastest installed one."""
+    if name == "auto":
+        name = "orjson" if "orjson" in ENCODERS else "json"
+    try:
+        return ENCODERS[name]
+    except KeyError:
+        raise ValueError("Incorrect JSON encoder!")
+
+
+def raw_json_response(
+    body: Union[str, bytes], headers: Optional[Dict] = None
+) -> web.Response:
+    """Return response of already encoded JSON."""
+    if isinstance(body, str):
+        body = body.encode()
+    return web.Response(
+        body=body, content_type="application/json", headers=headers
+    )
+
+
+def json_response(request: web.Request, data: Any) -> web.Response:
+    """Return response of `data` encoded by app encoder."""
+    return raw_json_response(request.app["json_dumps"](data))
@@ -0,0 +1,68 @@
+"""Metrics endpoint and middleware of web application.
+
+Metrics themselves are defined in `metrics` module.
+"""
+
+import time
+from typing import Optional
+
+from aiohttp import web
+
+from db.singleflight import flights
+from metrics import (
+    CACHE_ENTRIES,
+    FLIGHTS,
+    HTTP_LATENCY,
+    HTTP_REQUESTS,
+    PIPELINE,
+    REGISTRY,
+)
+
+__all__ = ("metrics", "metrics_middleware")
+
+
+def collect(app: web.Application) -> None:
+    """Set gauges of app state."""
+    if "cache" in app:
+        CACHE_ENTRIES.set(len(app["cache"]))
+    if "twitter_pipeline" in app:
+        for stat, value in app["twitter_pipeline"].stats().items():
+            PIPELINE.set(value, (stat,))
+    for kind, value in flights.totals().items():
+        FLIGHTS.set(value, (kind,))
+
+
+async def metrics(request: web.Request) -> web.Response:
+    """Metrics in Prometheus text format."""
+    collect(request.app)
+    return web.Response(
+        text=REGISTRY.render(),
+        content_type="text/plain",
+        headers={"X-Content-Type-Options": "nosniff"},
+    )
+
+
+def route_name(request: web.Request) -> str:
+    """Route pattern of request, so label values are bounded."""
+    resource = request.match_info.route.resource
+    return resource.canonical if resource is not None else "unmatched"
+
+
+@web.middleware
+async def metrics_middleware(
+    request: web.Request, handler
+) -> web.StreamResponse:
+    """Count requests and observe their latency by route."""
+    start = time.perf_counter()
+    status: Optional[int] = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        route = route_name(request)
+        HTTP_LATENCY.observe(time.perf_counter() - start, (route,))
+        HTTP_REQUESTS.inc(1, (route, request.method, str(status)))
@@ -2,14 +2,38 @@
 
 from aiohttp.web import Application
 
-from web.api import count_tweets, top_authors, top_hashtags, tweets
+from web.api import (
+    count_tweets,
+    recent_top,
+    statistic_summary,
+    top_authors,
+    top_hashtags,
+    tweets,
+    tweets_cursor,
+    tweets_export,
+)
+from web.metrics import metrics
 
 API_VERSION = "/api/v1"
 
 
 def setup_routes(app: Application) -> None:
     """Application API URIS."""
+    app.router.add_get("/metrics", metrics, name="metrics")
     app.router.add_get(API_VERSION + "/tweets/", tweets, name="tweets")
+    app.router.add_get(
+        API_VERSION + "/tweets/cursor/", tweets_cursor, name="tweets_cursor"
+    )
+    app.router.add_get(
+        API_VERSION + "/tweets/cursor/{cursor}/",
+        tweets_cursor,
+        name="tweets_cursor_next",
+    )
+    app.router.add_get(
+        API_VERSION + "/tweets/export/{from_date}/{to_date}/",
+        tweets_export,
+        name="tweets_export",
+    )
     app.router.add_get(
         API_VERSION + "/tweets/{offset}/", tweets, name="tweets_offset"
     )
@@ -28,3 +52,13 @@ def setup_routes(app: Application) -> None:
         count_tweets,
         name="count_tweets",
     )
+    app.router.add_get(
+        API_VERSION + "/statistic/summary/{from_date}/{to_date}/",
+        statistic_summary,
+        name="statistic_summary",
+    )
+    app.router.add_get(
+        API_VERSION + "/statistic/recent/{kind}/{minutes}/",
+        recent_top,
+        name="recent_top",
+    )
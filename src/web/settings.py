@@ -21,7 +21,86 @@ class Settings:
     DB_NAME: str = os.environ["POSTGRES_DB"]
     DB_HOST: str = "pg"
     DB_PORT: int = 5432
+    # Driver `aiopg` or `asyncpg` and prepared statements
+    # cached per connection by `asyncpg`.
+    DB_ENGINE: str = os.environ.get("DB_ENGINE") or "aiopg"
+    DB_STATEMENT_CACHE_SIZE: int = int(
+        os.environ.get("DB_STATEMENT_CACHE_SIZE") or 100
+    )
+    # Connections (min are opened on startup) of API pool and of
+    # background ingest pool (3 more are held by advisory locks and
+    # notifications), max wait for connection and max query time
+    # of API and of ingest in sec (0 is no limit), connections older
+    # than max lifetime in sec (0 is forever) are reopened.
+    DB_POOL_MIN_SIZE: int = int(os.environ.get("DB_POOL_MIN_SIZE") or 2)
+    DB_POOL_MAX_SIZE: int = int(os.environ.get("DB_POOL_MAX_SIZE") or 10)
+    DB_INGEST_POOL_MIN_SIZE: int = int(
+        os.environ.get("DB_INGEST_POOL_MIN_SIZE") or 2
+    )
+    DB_INGEST_POOL_MAX_SIZE: int = int(
+        os.environ.get("DB_INGEST_POOL_MAX_SIZE") or 5
+    )
+    DB_ACQUIRE_TIMEOUT: float = float(
+        os.environ.get("DB_ACQUIRE_TIMEOUT") or 10
+    )
+    DB_STATEMENT_TIMEOUT: float = float(
+        os.environ.get("DB_STATEMENT_TIMEOUT") or 30
+    )
+    DB_INGEST_STATEMENT_TIMEOUT: float = float(
+        os.environ.get("DB_INGEST_STATEMENT_TIMEOUT") or 600
+    )
+    DB_POOL_MAX_LIFETIME: float = float(
+        os.environ.get("DB_POOL_MAX_LIFETIME") or 3600
+    )
+    # Connections of exports pool, it's the max of concurrent exports,
+    # so slow export clients do not hold connections of API pool.
+    DB_EXPORT_POOL_SIZE: int = int(os.environ.get("DB_EXPORT_POOL_SIZE") or 2)
+    # Hot standby replicas for reads `host[:port],...`, max replication
+    # lag of replica in sec, read own writes (1) or not (0) and health
+    # check period of replicas in sec.
+    DB_REPLICA_HOSTS: str = os.environ.get("DB_REPLICA_HOSTS") or ""
+    DB_REPLICA_MAX_LAG: float = float(
+        os.environ.get("DB_REPLICA_MAX_LAG") or 5
+    )
+    DB_REPLICA_READ_YOUR_WRITES: int = int(
+        os.environ.get("DB_REPLICA_READ_YOUR_WRITES") or 0
+    )
+    DB_REPLICA_CHECK_PERIOD: float = float(
+        os.environ.get("DB_REPLICA_CHECK_PERIOD") or 5
+    )
+    # Monthly partitions are created for next days ahead, kept for days
+    # of retention (0 keeps them forever, so count of partitions read
+    # by latest tweets grows) and maintained once in period in sec.
+    DB_PARTITIONS_AHEAD: int = int(os.environ.get("DB_PARTITIONS_AHEAD") or 30)
+    DB_PARTITIONS_RETENTION: int = int(
+        os.environ.get("DB_PARTITIONS_RETENTION") or 365
+    )
+    DB_PARTITIONS_PERIOD: int = int(
+        os.environ.get("DB_PARTITIONS_PERIOD") or 3600
+    )
+
+    API_CACHE_SIZE: int = int(os.environ.get("API_CACHE_SIZE") or 1024)
+    API_CACHE_TTL: int = int(os.environ.get("API_CACHE_TTL") or 60)
+    # JSON encoder of responses made in Python: json, orjson or auto.
+    API_JSON_ENCODER: str = os.environ.get("API_JSON_ENCODER") or "auto"
+    # Export stream is cut after max time in sec or when client does not
+    # read it for max write time in sec.
+    API_EXPORT_TIMEOUT: float = float(
+        os.environ.get("API_EXPORT_TIMEOUT") or 600
+    )
+    API_EXPORT_WRITE_TIMEOUT: float = float(
+        os.environ.get("API_EXPORT_WRITE_TIMEOUT") or 30
+    )
+    # Counters per minute, window in minutes and period in sec of
+    # expiring minutes of in-process top hashtags and authors.
+    TOPK_COUNTERS: int = int(os.environ.get("TOPK_COUNTERS") or 100)
+    TOPK_WINDOW: int = int(os.environ.get("TOPK_WINDOW") or 60)
+    TOPK_PERIOD: int = int(os.environ.get("TOPK_PERIOD") or 2)
 
+    # Twitter API base URL, fake server of `bench.fake_twitter` in tests.
+    TWITTER_API_URL: str = (
+        os.environ.get("TWITTER_API_URL") or "https://api.twitter.com"
+    )
     TWITTER_CONSUMER_KEY: str = os.environ["TWITTER_CONSUMER_KEY"]
     TWITTER_CONSUMER_SECRET: str = os.environ["TWITTER_CONSUMER_SECRET"]
     TWITTER_QUERY_PHRASE: str = os.environ["TWITTER_QUERY_PHRASE"]
@@ -29,6 +108,19 @@ class Settings:
         os.environ["TWITTER_LAST_TWEETS_COUNT"]
     )
     TWITTER_TASK_PERIOD: int = int(os.environ["TWITTER_TASK_PERIOD"])
+    TWITTER_LEADER_PERIOD: int = int(
+        os.environ.get("TWITTER_LEADER_PERIOD") or 5
+    )
+    TWITTER_QUEUE_SIZE: int = int(os.environ.get("TWITTER_QUEUE_SIZE") or 100)
+    TWITTER_BATCH_SIZE: int = int(os.environ.get("TWITTER_BATCH_SIZE") or 500)
+    TWITTER_BATCH_TIMEOUT: float = float(
+        os.environ.get("TWITTER_BATCH_TIMEOUT") or 1
+    )
+    TWITTER_WRITERS: int = int(os.environ.get("TWITTER_WRITERS") or 1)
+    TWITTER_RATE_LIMIT: int = int(os.environ.get("TWITTER_RATE_LIMIT") or 180)
+    TWITTER_RATE_WINDOW: int = int(
+        os.environ.get("TWITTER_RATE_WINDOW") or 900
+    )
 
 
 @dataclass